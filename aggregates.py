@@ -0,0 +1,170 @@
+"""
+Agregados de calificaciones: promedio ponderado por créditos de cada
+estudiante (GPA, escala 0-100) y media, mediana y distribución por curso.
+
+Se leen de tablas de resumen en vez de recorrer grades:
+  - student_grade_stats: calificaciones, créditos y suma ponderada por estudiante.
+  - course_grade_stats: calificaciones y suma por curso.
+  - course_grade_counts: cuántas veces aparece cada valor en cada curso
+    (mediana exacta y distribución sin leer las calificaciones).
+
+Cada INSERT en grades las actualiza en la misma transacción
+(`storage.update_grade_aggregates`). `--rebuild` las recalcula completas con
+consultas GROUP BY sobre toda la tabla, útil tras cargas directas a la base
+(generate_data.py, bench/seed.py) o para corregir desvíos.
+
+Cada calificación registrada cuenta como una nota del curso de su matrícula.
+
+Uso:
+  python aggregates.py [DATABASE_URL] --rebuild
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+from storage import SUMMARY_TABLES, connect
+
+TWO_PLACES = Decimal('0.01')
+# Rangos de la distribución por curso; el último incluye 100.
+DISTRIBUTION_BINS = [(lo, lo + 10) for lo in range(0, 100, 10)]
+
+REBUILD_SQL = [
+    'INSERT INTO student_grade_stats (student_id, grades_count, graded_credits, weighted_sum) '
+    'SELECT e.student_id, COUNT(*), SUM(c.credits), ROUND(SUM(g.grade * c.credits), 2) FROM grades g '
+    'JOIN enrollments e ON e.id = g.enrollment_id JOIN courses c ON c.id = e.course_id '
+    'WHERE g.grade IS NOT NULL GROUP BY e.student_id',
+    'INSERT INTO course_grade_stats (course_id, grades_count, grade_sum) '
+    'SELECT e.course_id, COUNT(*), ROUND(SUM(g.grade), 2) FROM grades g '
+    'JOIN enrollments e ON e.id = g.enrollment_id '
+    'WHERE g.grade IS NOT NULL GROUP BY e.course_id',
+    'INSERT INTO course_grade_counts (course_id, grade, grades) '
+    'SELECT e.course_id, g.grade, COUNT(*) FROM grades g '
+    'JOIN enrollments e ON e.id = g.enrollment_id '
+    'WHERE g.grade IS NOT NULL GROUP BY e.course_id, g.grade',
+]
+
+
+def _average(total, count):
+    if not count:
+        return None
+    return (Decimal(str(total)) / count).quantize(TWO_PLACES)
+
+
+def rebuild(conn):
+    """Recalcular las tablas de resumen en una sola transacción; devuelve filas por tabla."""
+    cur = conn.cursor()
+    counts = {}
+    try:
+        for table in SUMMARY_TABLES:
+            cur.execute(f'DELETE FROM {table}')
+        for sql in REBUILD_SQL:
+            cur.execute(sql)
+            counts[sql.split()[2]] = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return counts
+
+
+def student_gpa(conn, student_id):
+    """Promedio ponderado por créditos de un estudiante; None si el estudiante no existe."""
+    cur = conn.cursor()
+    cur.execute('SELECT grades_count, graded_credits, weighted_sum FROM student_grade_stats WHERE student_id = %s',
+                (student_id,))
+    row = cur.fetchone()
+    if row is None:
+        cur.execute('SELECT 1 FROM students WHERE id = %s', (student_id,))
+        exists = cur.fetchone() is not None
+        cur.close()
+        return {'student_id': student_id, 'gpa': None, 'grades_count': 0, 'graded_credits': 0} if exists else None
+    cur.close()
+    grades_count, graded_credits, weighted_sum = row
+    return {'student_id': student_id, 'gpa': _average(weighted_sum, graded_credits),
+            'grades_count': grades_count, 'graded_credits': graded_credits}
+
+
+def median_from_counts(counts, total):
+    """Mediana a partir de [(valor, repeticiones)] ordenados por valor."""
+    if not total:
+        return None
+    wanted = [(total - 1) // 2, total // 2]
+    found = []
+    seen = 0
+    for value, n in counts:
+        while wanted and wanted[0] < seen + n:
+            found.append(Decimal(str(value)))
+            wanted.pop(0)
+        seen += n
+        if not wanted:
+            break
+    return ((found[0] + found[1]) / 2).quantize(TWO_PLACES)
+
+
+def course_stats(conn, course_id):
+    """Media, mediana, mínimo, máximo y distribución de un curso; None si no existe."""
+    cur = conn.cursor()
+    cur.execute('SELECT grades_count, grade_sum FROM course_grade_stats WHERE course_id = %s', (course_id,))
+    row = cur.fetchone()
+    if row is None:
+        cur.execute('SELECT 1 FROM courses WHERE id = %s', (course_id,))
+        exists = cur.fetchone() is not None
+        cur.close()
+        if not exists:
+            return None
+        row = (0, 0)
+    grades_count, grade_sum = row
+    cur.execute('SELECT grade, grades FROM course_grade_counts WHERE course_id = %s ORDER BY grade', (course_id,))
+    counts = cur.fetchall()
+    cur.close()
+
+    distribution = [{'from': lo, 'to': hi, 'count': 0} for lo, hi in DISTRIBUTION_BINS]
+    for value, n in counts:
+        distribution[min(int(value) // 10, len(DISTRIBUTION_BINS) - 1)]['count'] += n
+    return {
+        'course_id': course_id,
+        'grades_count': grades_count,
+        'mean': _average(grade_sum, grades_count),
+        'median': median_from_counts(counts, grades_count),
+        'min': Decimal(str(counts[0][0])).quantize(TWO_PLACES) if counts else None,
+        'max': Decimal(str(counts[-1][0])).quantize(TWO_PLACES) if counts else None,
+        'distribution': distribution,
+    }
+
+
+def courses_summary(conn):
+    """Media por curso para todos los cursos con calificaciones."""
+    cur = conn.cursor()
+    cur.execute('SELECT course_id, grades_count, grade_sum FROM course_grade_stats ORDER BY course_id')
+    rows = cur.fetchall()
+    cur.close()
+    return [{'course_id': cid, 'grades_count': n, 'mean': _average(total, n)} for cid, n, total in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agregados de calificaciones')
+    parser.add_argument('url', nargs='?', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--rebuild', action='store_true', help='recalcular todas las tablas de resumen')
+    args = parser.parse_args()
+
+    if not args.url:
+        print('Error: No se proporcionó DATABASE_URL. Pasa la URL como argumento o define la variable de entorno.')
+        sys.exit(2)
+    if not args.rebuild:
+        parser.print_help()
+        sys.exit(2)
+    conn = connect(args.url)
+    try:
+        started = time.perf_counter()
+        counts = rebuild(conn)
+        print(f'Tablas de resumen recalculadas en {time.perf_counter() - started:.1f}s:', counts)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Compara dos resultados de `bench/loadtest.py` (JSON) operación por operación.
+
+Uso:
+  python bench/compare.py base.json candidato.json [--threshold 10]
+
+Muestra el cambio porcentual de throughput y latencias. Termina con código 1
+si el p95 total del candidato empeora más que `--threshold` por ciento, para
+poder usarlo en CI.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')
+
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar dos corridas de loadtest')
+    parser.add_argument('base')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='empeoramiento máximo aceptado del p95 total, en %%')
+    args = parser.parse_args()
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    rows = [('TOTAL', base['total'], candidate['total'])]
+    for op in sorted(set(base['operations']) | set(candidate['operations'])):
+        rows.append((op, base['operations'].get(op, {}), candidate['operations'].get(op, {})))
+
+    print(f'{"operación":26}' + ''.join(f'{m:>18}' for m in METRICS))
+    for name, b, c in rows:
+        cells = []
+        for metric in METRICS:
+            delta = change(b.get(metric), c.get(metric))
+            cells.append(f'{c.get(metric)!s:>9} ({delta:+.1f}%)' if delta is not None else f'{c.get(metric)!s:>18}')
+        print(f'{name:26}' + ''.join(f'{cell:>18}' for cell in cells))
+
+    p95_change = change(base['total']['p95_ms'], candidate['total']['p95_ms'])
+    if p95_change is not None and p95_change > args.threshold:
+        print(f'El p95 total empeoró {p95_change:.1f}% (umbral {args.threshold}%).')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Resumen de latencias compartido por las herramientas de benchmark.
+
+`bench/loadtest.py` (y `bench/inprocess.py`, que lo usa) y
+`rest_service_py/bench_asgi.py` calculan los percentiles con `percentile` y
+reportan con `summarize`, así sus resultados se pueden comparar entre sí y
+con `bench/compare.py`.
+"""
+
+
+def percentile(sorted_values, p):
+    """Percentil `p` (0-100) por rango más cercano de una lista ya ordenada; None si está vacía."""
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def summarize(latencies, errors, duration):
+    """Throughput y latencias (ms, dos decimales) de las peticiones exitosas."""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / duration, 1) if duration else None,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1]) if latencies else None,
+    }
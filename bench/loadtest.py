@@ -0,0 +1,213 @@
+"""
+Prueba de carga de los servicios SOAP y REST con una mezcla realista de operaciones.
+
+Varios workers concurrentes (hilos con conexiones keep-alive) ejecutan una
+secuencia de operaciones elegida con una semilla fija, así dos corridas con
+los mismos argumentos envían exactamente las mismas peticiones. Se asume una
+base cargada con `bench/seed.py` (ids de 1 a N).
+
+El resultado (throughput y latencias p50/p95/p99 por operación y total) se
+imprime y, con `--output`, se guarda en JSON para compararlo con
+`bench/compare.py`.
+
+Uso:
+  python bench/loadtest.py --soap http://localhost:5000 --rest http://localhost:5001 \
+      --requests 5000 --concurrency 32 --students 5000 --courses 200 --output base.json
+"""
+import argparse
+import http.client
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from latency import summarize
+
+SOAP_ENVELOPE = ('<?xml version="1.0" encoding="utf-8"?>'
+                 '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+                 '<soap:Body>{}</soap:Body></soap:Envelope>')
+
+# Mezcla por defecto (pesos relativos), aproximada al tráfico del portal y la app.
+DEFAULT_MIX = {
+    'soap_get_enrollments': 35,
+    'soap_create_enrollment': 5,
+    'rest_list_courses': 20,
+    'rest_page_students': 10,
+    'rest_page_grades': 15,
+    'rest_create_grade': 10,
+    'rest_create_student': 5,
+}
+
+
+def build_request(op, rnd, sizes, seq, run_tag):
+    """Devolver (servicio, método, ruta, cuerpo, content_type) para la operación `op`."""
+    students, courses, enrollments = sizes['students'], sizes['courses'], sizes['enrollments']
+    if op == 'soap_get_enrollments':
+        body = SOAP_ENVELOPE.format(f'<GetEnrollments><student_id>{rnd.randint(1, students)}</student_id></GetEnrollments>')
+        return 'soap', 'POST', '/soap', body, 'text/xml'
+    if op == 'soap_create_enrollment':
+        body = SOAP_ENVELOPE.format(
+            f'<CreateEnrollment><student_id>{rnd.randint(1, students)}</student_id>'
+            f'<course_id>{rnd.randint(1, courses)}</course_id><status>enrolled</status></CreateEnrollment>')
+        return 'soap', 'POST', '/soap', body, 'text/xml'
+    if op == 'rest_list_courses':
+        return 'rest', 'GET', '/api/courses', None, None
+    if op == 'rest_page_students':
+        return 'rest', 'GET', f'/api/students?limit=100&after={rnd.randint(0, students)}', None, None
+    if op == 'rest_page_grades':
+        return 'rest', 'GET', f'/api/grades?limit=100&after={rnd.randint(0, enrollments)}', None, None
+    if op == 'rest_create_grade':
+        body = json.dumps({'enrollment_id': rnd.randint(1, enrollments), 'grade': round(rnd.uniform(50, 100), 2)})
+        return 'rest', 'POST', '/api/grades', body, 'application/json'
+    if op == 'rest_create_student':
+        # número único por corrida y secuencia para no chocar con la restricción UNIQUE
+        body = json.dumps({'student_number': f'L{run_tag}-{seq}', 'first_name': 'Carga',
+                           'last_name': 'Prueba', 'email': None})
+        return 'rest', 'POST', '/api/students', body, 'application/json'
+    raise ValueError(f'Operación desconocida: {op}')
+
+
+def plan_requests(mix, total, seed, sizes, run_tag):
+    """Secuencia determinista de peticiones para la semilla dada.
+
+    Sólo `run_tag` cambia entre corridas (números de estudiante únicos).
+    """
+    rnd = random.Random(seed)
+    ops = list(mix)
+    weights = [mix[op] for op in ops]
+    return [(op,) + build_request(op, rnd, sizes, seq, run_tag)
+            for seq, op in enumerate(rnd.choices(ops, weights, k=total))]
+
+
+def http_sender(bases):
+    """Función que envía una petición por HTTP con una conexión keep-alive por hilo y servicio.
+
+    Devuelve el código de estado, o None si la petición falló.
+    """
+    local = threading.local()
+
+    def send(service, method, path, body, headers):
+        conns = getattr(local, 'conns', None)
+        if conns is None:
+            conns = local.conns = {}
+        if service not in conns:
+            url = bases[service]
+            conns[service] = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        conn = conns[service]
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status
+        except Exception:
+            conn.close()
+            conns.pop(service, None)
+            return None
+    return send
+
+
+def run(plan, send, concurrency):
+    """Ejecutar `plan` con `concurrency` hilos; `send` es p. ej. `http_sender(bases)`."""
+    lock = threading.Lock()
+    per_op = {}
+
+    def execute(item):
+        op, service, method, path, body, content_type = item
+        headers = {'Content-Type': content_type} if content_type else {}
+        start = time.perf_counter()
+        status = send(service, method, path, body, headers)
+        ok = status is not None and status < 400
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies, errors = per_op.setdefault(op, ([], [0]))
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(execute, plan))
+    duration = time.perf_counter() - started
+
+    all_latencies = [v for latencies, _ in per_op.values() for v in latencies]
+    all_errors = sum(errors[0] for _, errors in per_op.values())
+    return {
+        'duration_s': round(duration, 3),
+        'total': summarize(all_latencies, all_errors, duration),
+        'operations': {op: summarize(latencies, errors[0], duration)
+                       for op, (latencies, errors) in sorted(per_op.items())},
+    }
+
+
+def print_result(result):
+    print(f'{"operación":26}{"n":>7}{"err":>6}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    for name, r in list(result['operations'].items()) + [('TOTAL', result['total'])]:
+        print(f'{name:26}{r["requests"]:>7}{r["errors"]:>6}{r["throughput_rps"]!s:>9}'
+              f'{r["p50_ms"]!s:>9}{r["p95_ms"]!s:>9}{r["p99_ms"]!s:>9}')
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga SOAP + REST')
+    parser.add_argument('--soap', default='http://localhost:5000', help='URL base del servicio SOAP')
+    parser.add_argument('--rest', default='http://localhost:5001', help='URL base del servicio REST')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--warmup', type=int, default=100, help='peticiones previas no medidas')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='pesos por operación, p. ej. "soap_get_enrollments=50,rest_list_courses=50"')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--students', type=int, default=1000, help='ids de estudiante disponibles (1..N)')
+    parser.add_argument('--courses', type=int, default=100)
+    parser.add_argument('--enrollments', type=int, default=5000, help='ids de matrícula disponibles (1..N)')
+    parser.add_argument('--label', default='', help='etiqueta libre guardada con el resultado')
+    parser.add_argument('--output', help='archivo JSON donde guardar el resultado')
+    args = parser.parse_args()
+
+    sizes = dict(students=args.students, courses=args.courses, enrollments=args.enrollments)
+    send = http_sender({'soap': urlparse(args.soap), 'rest': urlparse(args.rest)})
+
+    run_tag = format(int(time.time()), 'x')
+    if args.warmup:
+        run(plan_requests(args.mix, args.warmup, args.seed - 1, sizes, run_tag + 'w'), send, args.concurrency)
+    result = run(plan_requests(args.mix, args.requests, args.seed, sizes, run_tag), send, args.concurrency)
+    result['meta'] = {
+        'label': args.label,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'args': dict(requests=args.requests, concurrency=args.concurrency, seed=args.seed,
+                     mix=args.mix, sizes=sizes, soap=args.soap, rest=args.rest),
+    }
+
+    print_result(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print('Resultado guardado en', args.output)
+
+
+if __name__ == '__main__':
+    main()
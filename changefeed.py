@@ -0,0 +1,235 @@
+"""
+Feed de cambios: inserciones en students, courses, enrollments y grades.
+
+Cada INSERT de `storage.Entity` anota la fila en `change_log` en su misma
+transacción; el id de esa tabla es el cursor del feed (creciente). Los
+clientes piden "lo que haya después del cursor X" en lugar de releer los
+listados completos.
+
+Por proceso, un hilo lee las filas nuevas de `change_log` y las guarda ya
+serializadas en un buffer circular (`CHANGES_BUFFER` eventos) del que se
+sirve a los clientes al día. El hilo arranca con el primer cliente y consulta
+`change_log` (por clave primaria) cada `CHANGES_POLL_INTERVAL` segundos, o en
+cuanto `notify()` avisa de una escritura de este proceso. Un cliente más
+atrasado que el buffer se sirve directamente de `change_log`.
+
+Los ids se asignan al insertar y las transacciones confirman en otro orden:
+si falta un id, el hilo espera hasta `CHANGES_GAP_GRACE` segundos a que su
+transacción confirme antes de darlo por descartado (rollback). Así ningún
+cliente avanza su cursor por encima de un cambio que todavía no ve.
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+BOOTSTRAP_SCAN = 1000
+POLL_BATCH = 1000
+PURGE_EVERY = 3600.0
+
+
+class CursorExpired(Exception):
+    """El cursor es anterior a lo que conserva change_log (purgado)."""
+
+
+class ChangeFeed:
+    def __init__(self, pool, capacity=10000, poll_interval=1.0, gap_grace=5.0, retention_days=7):
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.gap_grace = gap_grace
+        self.retention_days = retention_days
+        # (cursor, tabla, evento JSON)
+        self._ring = deque(maxlen=capacity)
+        # Todo cursor > _floor y <= _head está en el buffer.
+        self._floor = self._head = None
+        self._gap_seen = None
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._waiting = 0
+        self._pid = None
+        self._last_purge = 0.0
+        self._stats = dict(polls=0, from_buffer=0, from_log=0, skipped_gaps=0)
+
+    # --- Clientes ----------------------------------------------------------------
+
+    def head(self):
+        """Cursor del último cambio confirmado (para empezar desde "ahora")."""
+        self._ensure_started()
+        with self._cond:
+            return self._head
+
+    def changes(self, cursor, limit=500, timeout=0.0, tables=None):
+        """Eventos posteriores a `cursor` (como mucho `limit`), esperando hasta `timeout` s.
+
+        Devuelve ([(cursor, evento JSON)], nuevo cursor). El cursor avanza
+        también sobre eventos de tablas no pedidas, así no se vuelven a revisar.
+        """
+        self._ensure_started()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._waiting += 1
+        try:
+            while True:
+                events, cursor = self._read(cursor, limit, tables)
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events, cursor
+                with self._cond:
+                    if self._head <= cursor:
+                        self._cond.wait(remaining)
+        finally:
+            with self._cond:
+                self._waiting -= 1
+
+    def notify(self):
+        """Avisar de una escritura en este proceso: leerla sin esperar al intervalo."""
+        self._wake.set()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, buffered=len(self._ring), waiting=self._waiting, head=self._head or 0)
+
+    def _read(self, cursor, limit, tables):
+        with self._cond:
+            if cursor >= self._floor:
+                newer = []
+                for entry in reversed(self._ring):
+                    if entry[0] <= cursor:
+                        break
+                    newer.append(entry)
+                self._stats['from_buffer'] += 1
+                return _take(reversed(newer), cursor, limit, tables)
+            floor = self._floor
+        # Atrasado respecto del buffer: hasta `floor` todo está confirmado en la BD.
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                if cursor > 0:
+                    # Si la fila del cursor sigue en el registro, MIN(id) <= cursor.
+                    cur.execute('SELECT MIN(id) FROM change_log')
+                    oldest = cur.fetchone()[0]
+                    if oldest is None or oldest > cursor + 1:
+                        raise CursorExpired(f'El cursor {cursor} ya no está en el registro de cambios')
+                cur.execute('SELECT id, table_name, payload FROM change_log WHERE id > %s AND id <= %s '
+                            'ORDER BY id LIMIT %s', (cursor, floor, limit))
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+        with self._cond:
+            self._stats['from_log'] += 1
+        if not rows:
+            return [], floor
+        return _take(((row_id, table, _event(row_id, table, payload)) for row_id, table, payload in rows),
+                     cursor, limit, tables, end=rows[-1][0] if len(rows) == limit else floor)
+
+    # --- Lectura de change_log ---------------------------------------------------
+
+    def _ensure_started(self):
+        # Un hilo por proceso, arrancado en el primer uso (después del fork de serve.py).
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._bootstrap()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='change-feed', daemon=True).start()
+
+    def _bootstrap(self):
+        """Arrancar el buffer vacío en el último id sin huecos recientes."""
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT id FROM change_log ORDER BY id DESC LIMIT %s', (BOOTSTRAP_SCAN,))
+            ids = sorted(row[0] for row in cur.fetchall())
+            cur.close()
+        head = ids[0] if ids else 0
+        for current in ids[1:]:
+            if current != head + 1:
+                # Puede ser una transacción en curso: se resuelve con el período de gracia.
+                break
+            head = current
+        self._ring.clear()
+        self._floor = self._head = head
+        self._gap_seen = None
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                while self._poll() == POLL_BATCH:
+                    pass
+                self._purge()
+            except Exception as e:
+                print(f'changefeed: error al leer change_log: {e}', file=sys.stderr)
+                time.sleep(self.poll_interval)
+
+    def _poll(self):
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT id, table_name, payload FROM change_log WHERE id > %s ORDER BY id LIMIT %s',
+                        (self._head, POLL_BATCH))
+            rows = cur.fetchall()
+            cur.close()
+        head, entries = self._head, []
+        for row_id, table, payload in rows:
+            if row_id != head + 1:
+                # Hueco: transacción sin confirmar o deshecha. Se espera gap_grace.
+                now = time.monotonic()
+                if self._gap_seen is None or self._gap_seen[0] != head + 1:
+                    self._gap_seen = (head + 1, now)
+                if now - self._gap_seen[1] < self.gap_grace:
+                    break
+                self._stats['skipped_gaps'] += 1
+            self._gap_seen = None
+            entries.append((row_id, table, _event(row_id, table, payload)))
+            head = row_id
+        with self._cond:
+            self._stats['polls'] += 1
+            if entries:
+                evicted = max(0, len(self._ring) + len(entries) - self._ring.maxlen)
+                if evicted:
+                    # El buffer deja de cubrir los cursores de las entradas que salen.
+                    self._floor = (self._ring[evicted - 1][0] if evicted <= len(self._ring)
+                                   else entries[evicted - len(self._ring) - 1][0])
+                self._ring.extend(entries)
+                self._head = head
+                self._cond.notify_all()
+        # Menos que un lote completo (o un hueco en espera): ya no hay más por leer.
+        return len(entries)
+
+    def _purge(self):
+        if time.monotonic() - self._last_purge < PURGE_EVERY:
+            return
+        self._last_purge = time.monotonic()
+        # created_at usa CURRENT_TIMESTAMP del servidor (UTC en Railway y en SQLite).
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=self.retention_days)
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT MAX(id) FROM change_log WHERE created_at < %s', (cutoff,))
+            horizon = cur.fetchone()[0]
+            if horizon is not None:
+                cur.execute('DELETE FROM change_log WHERE id <= %s', (horizon,))
+                conn.commit()
+            cur.close()
+
+
+def _event(row_id, table, payload):
+    # payload ya es JSON: el evento se arma sin volver a serializar.
+    return f'{{"cursor":{row_id},"table":"{table}","data":{payload}}}'
+
+
+def _take(entries, cursor, limit, tables, end=None):
+    """Filtrar por tabla y cortar en `limit`; devuelve (eventos, último cursor revisado)."""
+    events = []
+    for row_id, table, event in entries:
+        if len(events) >= limit:
+            break
+        cursor = row_id
+        if tables is None or table in tables:
+            events.append((row_id, event))
+    if end is not None and len(events) < limit:
+        cursor = max(cursor, end)
+    return events, cursor
@@ -1,4 +1,5 @@
 -- Esquema simplificado para la plataforma unificada (MySQL)
+-- Referencia completa del modelo; se aplica con `python migrate.py` (migrations/).
 
 CREATE TABLE IF NOT EXISTS students (
   id INT AUTO_INCREMENT PRIMARY KEY,
@@ -32,3 +33,60 @@ CREATE TABLE IF NOT EXISTS grades (
   graded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
   FOREIGN KEY (enrollment_id) REFERENCES enrollments(id) ON DELETE CASCADE
 );
+
+-- Tablas de resumen de calificaciones (migrations/0004_grade_aggregates.sql, ver aggregates.py)
+CREATE TABLE IF NOT EXISTS student_grade_stats (
+  student_id INT PRIMARY KEY,
+  grades_count INT NOT NULL DEFAULT 0,
+  graded_credits INT NOT NULL DEFAULT 0,
+  weighted_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+  FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS course_grade_stats (
+  course_id INT PRIMARY KEY,
+  grades_count INT NOT NULL DEFAULT 0,
+  grade_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+  FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS course_grade_counts (
+  course_id INT NOT NULL,
+  grade DECIMAL(5,2) NOT NULL,
+  grades INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (course_id, grade),
+  FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+);
+
+-- Tickets de la escritura diferida de calificaciones (migrations/0005_grade_tickets.sql)
+CREATE TABLE IF NOT EXISTS grade_tickets (
+  ticket CHAR(32) PRIMARY KEY,
+  grade_id INT NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (grade_id) REFERENCES grades(id) ON DELETE CASCADE
+);
+
+-- Registro de cambios del feed /api/changes (migrations/0006_change_log.sql)
+CREATE TABLE IF NOT EXISTS change_log (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  table_name VARCHAR(30) NOT NULL,
+  row_id INT NOT NULL,
+  payload TEXT NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Versión por tabla para los ETag (migrations/0007_table_versions.sql y 0008)
+CREATE TABLE IF NOT EXISTS table_versions (
+  table_name VARCHAR(30) NOT NULL,
+  shard SMALLINT NOT NULL DEFAULT 0,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at DATETIME(6) NOT NULL,
+  PRIMARY KEY (table_name, shard)
+);
+
+-- Índices para las consultas frecuentes (migrations/0002_hot_query_indexes.sql y 0003)
+CREATE INDEX idx_enrollments_student_course ON enrollments (student_id, course_id);
+CREATE INDEX idx_grades_enrollment_graded ON grades (enrollment_id, graded_at);
+CREATE INDEX idx_grades_graded_at ON grades (graded_at);
+CREATE INDEX idx_grade_tickets_created ON grade_tickets (created_at);
+CREATE INDEX idx_change_log_created ON change_log (created_at);
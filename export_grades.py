@@ -0,0 +1,317 @@
+"""
+Exportación masiva de calificaciones (CSV, NDJSON o XLSX) en streaming.
+
+Une grades con enrollments, students y courses y lee el resultado de un
+cursor sin buffer por bloques: cada bloque se convierte en bytes y se envía
+(o se escribe) antes de leer el siguiente, así la memoria no depende del
+tamaño de la exportación. El XLSX se arma con un ZIP escrito en streaming y
+celdas en línea (sin tabla de cadenas compartidas); al llegar al límite de
+filas de Excel se continúa en una hoja nueva. Con `gzip` la salida se
+comprime al vuelo.
+
+Lo usan el endpoint `GET /api/grades/export` del servicio REST y esta CLI:
+  python export_grades.py [DATABASE_URL] --format csv --course-code MAT00012 \
+      --from 2024-01-01 --to 2024-06-30 --gzip --output grades.csv.gz
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import zipfile
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from storage import connect
+
+EXPORT_COLUMNS = (
+    ('grade_id', 'g.id'),
+    ('grade', 'g.grade'),
+    ('graded_at', 'g.graded_at'),
+    ('enrollment_id', 'e.id'),
+    ('status', 'e.status'),
+    ('student_id', 's.id'),
+    ('student_number', 's.student_number'),
+    ('first_name', 's.first_name'),
+    ('last_name', 's.last_name'),
+    ('course_id', 'c.id'),
+    ('course_code', 'c.code'),
+    ('course_name', 'c.name'),
+    ('credits', 'c.credits'),
+)
+HEADER = [name for name, _ in EXPORT_COLUMNS]
+
+# formato -> (content type, extensión)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+FETCH_SIZE = 2000
+# Filas de datos por hoja (Excel admite 1.048.576 contando el encabezado).
+XLSX_MAX_ROWS = 1048575
+
+
+def parse_filters(course_id=None, course_code=None, graded_from=None, graded_to=None):
+    """Validar los filtros; lanza ValueError con un mensaje para el cliente.
+
+    `graded_from` y `graded_to` son fechas u horas ISO; una fecha sin hora en
+    `graded_to` incluye todo ese día.
+    """
+    filters = {}
+    if course_id not in (None, ''):
+        try:
+            filters['course_id'] = int(course_id)
+        except (TypeError, ValueError):
+            raise ValueError('course_id must be an integer')
+    if course_code:
+        filters['course_code'] = course_code
+    for key, value in (('graded_from', graded_from), ('graded_to', graded_to)):
+        if not value:
+            continue
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f'{key} must be an ISO date (YYYY-MM-DD) or datetime')
+        if key == 'graded_to' and len(value) == 10:
+            filters['graded_before'] = moment + timedelta(days=1)
+        else:
+            filters[key] = moment
+    return filters
+
+
+def export_query(filters):
+    """SQL y parámetros de la exportación para los filtros de `parse_filters`."""
+    where, params = [], []
+    if 'course_id' in filters:
+        where.append('c.id = %s')
+        params.append(filters['course_id'])
+    if 'course_code' in filters:
+        where.append('c.code = %s')
+        params.append(filters['course_code'])
+    if 'graded_from' in filters:
+        where.append('g.graded_at >= %s')
+        params.append(filters['graded_from'])
+    if 'graded_to' in filters:
+        where.append('g.graded_at <= %s')
+        params.append(filters['graded_to'])
+    if 'graded_before' in filters:
+        where.append('g.graded_at < %s')
+        params.append(filters['graded_before'])
+    sql = (f'SELECT {", ".join(expr for _, expr in EXPORT_COLUMNS)} FROM grades g '
+           'JOIN enrollments e ON e.id = g.enrollment_id '
+           'JOIN students s ON s.id = e.student_id '
+           'JOIN courses c ON c.id = e.course_id')
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    return sql + ' ORDER BY g.id', tuple(params)
+
+
+def fetch_blocks(conn, sql, params, size=FETCH_SIZE):
+    """Bloques de filas (tuplas) leídos de un cursor sin buffer."""
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def csv_chunks(blocks):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(HEADER)
+    for rows in blocks:
+        writer.writerows([_text(v) for v in row] for row in rows)
+        yield buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(blocks):
+    for rows in blocks:
+        lines = [json.dumps(dict(zip(HEADER, row)), default=_text, ensure_ascii=False) for row in rows]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _ChunkSink:
+    """Destino no posicionable para `zipfile`: acumula bytes hasta que se vacían."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+_XLSX_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(_text(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(v) for v in values) + '</row>'
+
+
+def xlsx_chunks(blocks):
+    sink = _ChunkSink()
+    zf = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED)
+    sheets = 0
+    sheet = None
+    rows_in_sheet = 0
+
+    def open_sheet():
+        nonlocal sheets, sheet, rows_in_sheet
+        sheets += 1
+        sheet = zf.open(f'xl/worksheets/sheet{sheets}.xml', 'w', force_zip64=True)
+        sheet.write((f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     f'<worksheet xmlns="{_XLSX_NS}"><sheetData>' + _xlsx_row(HEADER)).encode('utf-8'))
+        rows_in_sheet = 0
+
+    def close_sheet():
+        sheet.write(b'</sheetData></worksheet>')
+        sheet.close()
+
+    open_sheet()
+    for rows in blocks:
+        parts = []
+        for row in rows:
+            if rows_in_sheet == XLSX_MAX_ROWS:
+                sheet.write(''.join(parts).encode('utf-8'))
+                parts = []
+                close_sheet()
+                open_sheet()
+            parts.append(_xlsx_row(row))
+            rows_in_sheet += 1
+        sheet.write(''.join(parts).encode('utf-8'))
+        yield sink.drain()
+    close_sheet()
+
+    names = range(1, sheets + 1)
+    zf.writestr('[Content_Types].xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        + ''.join(f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                  'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                  for n in names)
+        + '</Types>'))
+    zf.writestr('_rels/.rels', (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_PKG_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>'))
+    zf.writestr('xl/workbook.xml', (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<workbook xmlns="{_XLSX_NS}" xmlns:r="{_REL_NS}"><sheets>'
+        + ''.join(f'<sheet name="grades{"" if n == 1 else n}" sheetId="{n}" r:id="rId{n}"/>' for n in names)
+        + '</sheets></workbook>'))
+    zf.writestr('xl/_rels/workbook.xml.rels', (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_PKG_REL_NS}">'
+        + ''.join(f'<Relationship Id="rId{n}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                  for n in names)
+        + '</Relationships>'))
+    zf.close()
+    yield sink.drain()
+
+
+WRITERS = {'csv': csv_chunks, 'ndjson': ndjson_chunks, 'xlsx': xlsx_chunks}
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(conn, fmt, filters, compress=False):
+    """Generador de bytes de la exportación en `fmt` ('csv', 'ndjson' o 'xlsx')."""
+    sql, params = export_query(filters)
+    chunks = WRITERS[fmt](fetch_blocks(conn, sql, params))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def filename(fmt, compress=False):
+    return f'grades.{FORMATS[fmt][1]}' + ('.gz' if compress else '')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportar calificaciones en streaming')
+    parser.add_argument('url', nargs='?', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    parser.add_argument('--course-id')
+    parser.add_argument('--course-code')
+    parser.add_argument('--from', dest='graded_from', help='graded_at desde (YYYY-MM-DD o ISO)')
+    parser.add_argument('--to', dest='graded_to', help='graded_at hasta, inclusive')
+    parser.add_argument('--gzip', action='store_true', help='comprimir la salida con gzip')
+    parser.add_argument('--output', help='archivo de salida (por defecto stdout)')
+    args = parser.parse_args()
+
+    if not args.url:
+        print('Error: No se proporcionó DATABASE_URL. Pasa la URL como argumento o define la variable de entorno.',
+              file=sys.stderr)
+        sys.exit(2)
+    try:
+        filters = parse_filters(args.course_id, args.course_code, args.graded_from, args.graded_to)
+    except ValueError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(2)
+
+    conn = connect(args.url)
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        written = 0
+        for chunk in export(conn, args.format, filters, args.gzip):
+            out.write(chunk)
+            written += len(chunk)
+        if args.output:
+            print(f'{written:,} bytes escritos en {args.output}', file=sys.stderr)
+    finally:
+        if args.output:
+            out.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""
+Generador de datos sintéticos de alto volumen (estudiantes, cursos, matrículas
+y calificaciones) para probar a escala de producción.
+
+- Distribuciones realistas: nombres y apellidos comunes, cursos por
+  departamento con popularidad desigual, número de materias por estudiante
+  alrededor de `--enrollments-per-student`, estatus enrolled/completed/dropped
+  y calificaciones según el desempeño de cada estudiante.
+- Llaves foráneas consistentes: los ids se asignan explícitamente (estudiantes
+  y cursos de 1 a N, matrículas consecutivas y la calificación de una
+  matrícula usa el mismo id), así los bloques se cargan en paralelo sin
+  consultar ids generados.
+- Determinista: con la misma `--seed` y `--chunk-size` los datos son idénticos
+  sin importar el número de workers; cada bloque tiene su propio generador
+  aleatorio.
+- Carga con INSERT multi-fila (`--method insert`, cualquier backend) o con
+  `LOAD DATA LOCAL INFILE` (`--method load-data`, sólo MySQL; requiere
+  `local_infile=1` en el servidor).
+
+Uso:
+  python generate_data.py [DATABASE_URL] --reset --students 2000000 --courses 3000 \
+      --workers 8 --method load-data --seed 7
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+from storage import COURSES, ENROLLMENTS, GRADES, STUDENTS, backend_name, connect, reset_tables
+from aggregates import rebuild
+
+FIRST_NAMES = ['Juan', 'María', 'José', 'Guadalupe', 'Luis', 'Ana', 'Carlos', 'Fernanda', 'Jorge', 'Daniela',
+               'Miguel', 'Sofía', 'Alejandro', 'Valeria', 'Ricardo', 'Camila', 'Diego', 'Ximena', 'Fernando',
+               'Andrea', 'Eduardo', 'Mariana', 'Roberto', 'Paola', 'Arturo', 'Regina', 'Héctor', 'Natalia']
+LAST_NAMES = ['Hernández', 'García', 'Martínez', 'López', 'González', 'Pérez', 'Rodríguez', 'Sánchez',
+              'Ramírez', 'Cruz', 'Flores', 'Gómez', 'Morales', 'Vázquez', 'Reyes', 'Jiménez', 'Torres',
+              'Díaz', 'Gutiérrez', 'Ruiz', 'Mendoza', 'Aguilar', 'Ortiz', 'Castillo', 'Romero', 'Álvarez']
+DEPARTMENTS = {
+    'MAT': ['Cálculo', 'Álgebra Lineal', 'Ecuaciones Diferenciales', 'Probabilidad', 'Estadística'],
+    'INF': ['Programación', 'Estructuras de Datos', 'Bases de Datos', 'Redes', 'Sistemas Operativos'],
+    'FIS': ['Física', 'Mecánica', 'Electromagnetismo', 'Termodinámica'],
+    'QUI': ['Química General', 'Química Orgánica', 'Bioquímica'],
+    'ADM': ['Administración', 'Contabilidad', 'Finanzas', 'Mercadotecnia'],
+    'HUM': ['Ética', 'Redacción', 'Historia de México', 'Inglés'],
+}
+LEVELS = ['I', 'II', 'III', 'IV']
+CREDITS, CREDIT_WEIGHTS = (3, 4, 5, 6, 8), (40, 30, 15, 10, 5)
+STATUSES, STATUS_WEIGHTS = ('enrolled', 'completed', 'dropped'), (35, 57, 8)
+# Inicio de los periodos escolares (enero y agosto) usados para las fechas.
+FIRST_TERM = datetime(2019, 1, 14)
+TERMS = 14
+
+CHUNK_SIZE = 5000
+# Filas por sentencia INSERT multi-fila.
+INSERT_BATCH = 1000
+
+
+def chunk_rng(seed, kind, index):
+    """Generador aleatorio propio de un bloque: el resultado no depende del orden de ejecución."""
+    return random.Random(f'{seed}:{kind}:{index}')
+
+
+def ranges(total, chunk_size, first=1):
+    """[(índice, primer_id, cantidad)] que cubren los ids first..first+total-1."""
+    return [(i, first + start, min(chunk_size, total - start))
+            for i, start in enumerate(range(0, total, chunk_size))]
+
+
+def course_weights(seed, courses):
+    """Pesos acumulados de popularidad por curso (tipo Zipf, en orden aleatorio fijo)."""
+    order = list(range(1, courses + 1))
+    random.Random(f'{seed}:popularity').shuffle(order)
+    weights = [0.0] * courses
+    for rank, course_id in enumerate(order, start=1):
+        weights[course_id - 1] = 1.0 / rank ** 0.8
+    cumulative, acc = [], 0.0
+    for w in weights:
+        acc += w
+        cumulative.append(acc)
+    return cumulative
+
+
+def enrollment_counts(seed, index, count, mean, courses):
+    """Materias por estudiante de un bloque; el proceso principal y el worker obtienen lo mismo."""
+    rnd = chunk_rng(seed, 'counts', index)
+    return [min(courses, max(1, int(round(rnd.gauss(mean, mean / 3))))) for _ in range(count)]
+
+
+def ascii_slug(text):
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower()
+
+
+def course_rows(seed, index, first_id, count):
+    rnd = chunk_rng(seed, 'courses', index)
+    departments = list(DEPARTMENTS)
+    rows = []
+    for course_id in range(first_id, first_id + count):
+        dept = rnd.choice(departments)
+        name = f'{rnd.choice(DEPARTMENTS[dept])} {rnd.choice(LEVELS)}'
+        rows.append((course_id, f'{dept}{course_id:05d}', name, rnd.choices(CREDITS, CREDIT_WEIGHTS)[0]))
+    return rows
+
+
+def student_rows(seed, index, first_id, count):
+    rnd = chunk_rng(seed, 'students', index)
+    rows = []
+    for student_id in range(first_id, first_id + count):
+        first = rnd.choice(FIRST_NAMES)
+        last = f'{rnd.choice(LAST_NAMES)} {rnd.choice(LAST_NAMES)}'
+        cohort = 2015 + rnd.randrange(11)
+        user = ascii_slug(f'{first[0]}{last.split()[0]}{student_id}')
+        rows.append((student_id, f'{cohort}{student_id:08d}', first, last, f'{user}@uav.edu.mx'))
+    return rows
+
+
+def enrollment_and_grade_rows(seed, index, first_student, count, first_enrollment, mean, courses, cumulative):
+    """Matrículas y calificaciones de un bloque de estudiantes."""
+    counts = enrollment_counts(seed, index, count, mean, courses)
+    rnd = chunk_rng(seed, 'enrollments', index)
+    enrollments, grades = [], []
+    enrollment_id = first_enrollment
+    population = range(1, courses + 1)
+    for student_id, wanted in zip(range(first_student, first_student + count), counts):
+        ability = rnd.gauss(78, 9)
+        chosen = set()
+        while len(chosen) < wanted:
+            chosen.update(rnd.choices(population, cum_weights=cumulative, k=wanted - len(chosen)))
+        term = rnd.randrange(TERMS)
+        for course_id in sorted(chosen):
+            status = rnd.choices(STATUSES, STATUS_WEIGHTS)[0]
+            start = FIRST_TERM + timedelta(days=182 * term)
+            enrolled_at = start + timedelta(days=rnd.randrange(10), seconds=rnd.randrange(86400))
+            enrollments.append((enrollment_id, student_id, course_id, status, enrolled_at.strftime('%Y-%m-%d %H:%M:%S')))
+            # Las bajas no tienen calificación; las materias en curso, sólo el parcial de algunas.
+            if status == 'completed' or (status == 'enrolled' and rnd.random() < 0.4):
+                grade = round(min(100.0, max(0.0, rnd.gauss(ability, 8))), 2)
+                graded_at = enrolled_at + timedelta(days=rnd.randint(40, 120), seconds=rnd.randrange(86400))
+                grades.append((enrollment_id, enrollment_id, grade, graded_at.strftime('%Y-%m-%d %H:%M:%S')))
+            enrollment_id += 1
+            if rnd.random() < 0.5:
+                term = min(TERMS - 1, term + 1)
+    return enrollments, grades
+
+
+TABLE_COLUMNS = {
+    'courses': ('id',) + COURSES.insert_columns,
+    'students': ('id',) + STUDENTS.insert_columns,
+    'enrollments': ('id',) + ENROLLMENTS.insert_columns + ('enrolled_at',),
+    'grades': ('id',) + GRADES.insert_columns + ('graded_at',),
+}
+
+
+def insert_rows(conn, table, rows):
+    columns = TABLE_COLUMNS[table]
+    sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))})'
+    cur = conn.cursor()
+    for start in range(0, len(rows), INSERT_BATCH):
+        cur.executemany(sql, rows[start:start + INSERT_BATCH])
+    conn.commit()
+    cur.close()
+
+
+def load_data_rows(conn, table, rows):
+    """Cargar con LOAD DATA LOCAL INFILE desde un CSV temporal."""
+    columns = TABLE_COLUMNS[table]
+    fd, path = tempfile.mkstemp(prefix=f'uau_{table}_', suffix='.csv')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f, lineterminator='\n').writerows(rows)
+        cur = conn.cursor()
+        cur.execute(f"LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}' INTO TABLE {table} "
+                    f"CHARACTER SET utf8 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                    f"LINES TERMINATED BY '\\n' ({', '.join(columns)})")
+        conn.commit()
+        cur.close()
+    finally:
+        os.remove(path)
+
+
+# --- Workers --------------------------------------------------------------------
+
+_worker = {}
+
+
+def init_worker(url, method, fast):
+    options = dict(allow_local_infile=True) if method == 'load-data' else {}
+    conn = connect(url, **options)
+    if fast and backend_name(url) == 'mysql':
+        # Las llaves ya son consistentes por construcción; se omiten las verificaciones.
+        cur = conn.cursor()
+        cur.execute('SET foreign_key_checks = 0, unique_checks = 0')
+        cur.close()
+    _worker.update(conn=conn, load=load_data_rows if method == 'load-data' else insert_rows)
+
+
+def run_task(task):
+    """Generar e insertar un bloque; devuelve (tabla, filas insertadas)."""
+    kind, params = task
+    conn, load = _worker['conn'], _worker['load']
+    if kind == 'courses':
+        rows = course_rows(*params)
+        load(conn, 'courses', rows)
+        return [('courses', len(rows))]
+    if kind == 'students':
+        rows = student_rows(*params)
+        load(conn, 'students', rows)
+        return [('students', len(rows))]
+    enrollments, grades = enrollment_and_grade_rows(*params)
+    load(conn, 'enrollments', enrollments)
+    load(conn, 'grades', grades)
+    return [('enrollments', len(enrollments)), ('grades', len(grades))]
+
+
+class Progress:
+    """Reporte de avance en stderr: filas por tabla, velocidad y tiempo estimado."""
+
+    def __init__(self, phase, total_tasks):
+        self.phase = phase
+        self.total_tasks = total_tasks
+        self.done = 0
+        self.rows = {}
+        self.started = time.perf_counter()
+        self.last_report = 0.0
+
+    def update(self, counts):
+        self.done += 1
+        for table, n in counts:
+            self.rows[table] = self.rows.get(table, 0) + n
+        now = time.perf_counter()
+        if now - self.last_report >= 1 or self.done == self.total_tasks:
+            self.last_report = now
+            elapsed = now - self.started
+            total_rows = sum(self.rows.values())
+            eta = elapsed / self.done * (self.total_tasks - self.done)
+            detail = ', '.join(f'{t}={n:,}' for t, n in self.rows.items())
+            sys.stderr.write(f'\r[{self.phase}] {self.done}/{self.total_tasks} bloques  {detail}  '
+                             f'{total_rows / elapsed if elapsed else 0:,.0f} filas/s  ETA {eta:,.0f}s   ')
+            if self.done == self.total_tasks:
+                sys.stderr.write('\n')
+            sys.stderr.flush()
+
+
+def run_phase(pool, phase, tasks):
+    progress = Progress(phase, len(tasks))
+    results = pool.imap_unordered(run_task, tasks) if pool else map(run_task, tasks)
+    for counts in results:
+        progress.update(counts)
+    return progress.rows
+
+
+def generate(url, students, courses, enrollments_per_student, seed, chunk_size=CHUNK_SIZE,
+             workers=1, method='insert', fast=False):
+    """Generar y cargar todos los datos; devuelve los conteos por tabla."""
+    student_chunks = ranges(students, chunk_size)
+    course_tasks = [('courses', (seed, i, first, n)) for i, first, n in ranges(courses, chunk_size)]
+    student_tasks = [('students', (seed, i, first, n)) for i, first, n in student_chunks]
+
+    # Los ids de matrícula de cada bloque se calculan de antemano a partir de
+    # los conteos por estudiante, que el worker vuelve a generar igual.
+    cumulative = course_weights(seed, courses)
+    enrollment_tasks, next_enrollment = [], 1
+    for i, first, n in student_chunks:
+        enrollment_tasks.append(('enrollments', (seed, i, first, n, next_enrollment,
+                                                 enrollments_per_student, courses, cumulative)))
+        next_enrollment += sum(enrollment_counts(seed, i, n, enrollments_per_student, courses))
+
+    counts = {}
+    pool = Pool(workers, init_worker, (url, method, fast)) if workers > 1 else None
+    if pool is None:
+        init_worker(url, method, fast)
+    try:
+        # Cursos y estudiantes antes que matrículas para respetar las llaves foráneas.
+        counts.update(run_phase(pool, 'courses', course_tasks))
+        counts.update(run_phase(pool, 'students', student_tasks))
+        counts.update(run_phase(pool, 'enrollments', enrollment_tasks))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        else:
+            _worker['conn'].close()
+    # Las cargas masivas no pasan por Grades.insert: recalcular los resúmenes al final.
+    conn = connect(url)
+    try:
+        rebuild(conn)
+    finally:
+        conn.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generador de datos sintéticos de alto volumen')
+    parser.add_argument('url', nargs='?', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--courses', type=int, default=100)
+    parser.add_argument('--enrollments-per-student', type=float, default=6,
+                        help='promedio de materias por estudiante')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='entidades por bloque')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='procesos en paralelo (en SQLite se usa 1)')
+    parser.add_argument('--method', choices=('insert', 'load-data'), default='insert')
+    parser.add_argument('--fast', action='store_true',
+                        help='MySQL: desactivar foreign_key_checks/unique_checks durante la carga')
+    parser.add_argument('--reset', action='store_true', help='vaciar las tablas antes de cargar')
+    args = parser.parse_args(argv)
+
+    if not args.url:
+        print('Error: No se proporcionó DATABASE_URL. Pasa la URL como argumento o define la variable de entorno.')
+        sys.exit(2)
+    backend = backend_name(args.url)
+    if args.method == 'load-data' and backend != 'mysql':
+        print('Error: --method load-data sólo está disponible con MySQL.')
+        sys.exit(2)
+    # SQLite admite un solo escritor a la vez: más procesos sólo esperarían el bloqueo.
+    workers = 1 if backend == 'sqlite' else max(1, args.workers)
+
+    conn = connect(args.url)
+    try:
+        if backend != 'sqlite':
+            from migrate import migrate
+            migrate(conn)
+        if args.reset:
+            reset_tables(conn)
+        elif STUDENTS.max_id(conn) or COURSES.max_id(conn):
+            print('Error: La base ya tiene datos; usa --reset para reemplazarlos.')
+            sys.exit(2)
+    finally:
+        conn.close()
+
+    started = time.perf_counter()
+    counts = generate(args.url, args.students, args.courses, args.enrollments_per_student, args.seed,
+                      args.chunk_size, workers, args.method, args.fast)
+    print(f'Datos generados en {time.perf_counter() - started:.1f}s:', counts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,492 @@
+"""
+Importación masiva de calificaciones desde los volcados del sistema anterior
+(CSV, XLSX, JSON o NDJSON).
+
+- Lee el archivo en streaming (CSV por filas, XLSX con iterparse sobre la
+  hoja, JSON con un decodificador incremental), sin cargarlo completo.
+- Resuelve `student_number` + `course_code` a `enrollment_id` con un índice
+  precargado en memoria (tres consultas al inicio en vez de una por fila).
+  Si hay varias matrículas del mismo estudiante en el curso, usa la más reciente.
+- Omite duplicados contra las calificaciones existentes y dentro del archivo:
+  `--dedupe value` (por defecto) omite la misma calificación para la misma
+  matrícula; `--dedupe enrollment` omite cualquier matrícula que ya tenga una.
+- Inserta en bloques de `--chunk-size` registros, cada uno en su propia
+  transacción, con `--workers` hilos en paralelo.
+- Checkpoint reanudable: los bloques confirmados se anotan en
+  `ARCHIVO.checkpoint.json`; al repetir el comando se saltan.
+- Reporte de errores `ARCHIVO.errors.csv` con el número de registro, los
+  datos originales y el motivo (JSON mal formado, campo faltante,
+  calificación inválida, estudiante/curso/matrícula inexistente, duplicado
+  o error de inserción).
+
+Columnas reconocidas (sin importar mayúsculas): student_number|matricula,
+course_code|clave|code, grade|calificacion, graded_at|fecha (opcional).
+
+Uso:
+  python import_grades.py calificaciones_2019.xlsx --workers 4
+  python import_grades.py dump.json --url sqlite:///local.db --dedupe enrollment
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from xml.etree import ElementTree
+
+from storage import Grades, create_pool
+
+CHUNK_SIZE = 2000
+GRADES_WITH_DATE = Grades('grades', ('id', 'enrollment_id', 'grade', 'graded_at'),
+                          ('enrollment_id', 'grade', 'graded_at'))
+
+FIELD_ALIASES = {
+    'student_number': ('student_number', 'matricula', 'student'),
+    'course_code': ('course_code', 'clave', 'code', 'course'),
+    'grade': ('grade', 'calificacion', 'calificación'),
+    'graded_at': ('graded_at', 'fecha', 'date'),
+}
+REPORT_FIELDS = ['record', 'student_number', 'course_code', 'grade', 'graded_at', 'error']
+
+
+# --- Lectura en streaming ------------------------------------------------------
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+class MalformedRecord(ValueError):
+    """Registro que no se pudo decodificar; el lector lo entrega en su lugar."""
+
+
+# Inicio de línea que abre el siguiente objeto (o cierra el arreglo).
+_NEXT_RECORD = re.compile(r'\n[ \t\r,]*(?=[{\]])')
+
+
+def read_json(path, block_size=1 << 16):
+    """Objetos de un arreglo JSON o de un archivo NDJSON, decodificados de a uno.
+
+    Un objeto mal formado se entrega como `MalformedRecord` (con su número de
+    línea) y la lectura sigue en la siguiente línea que abre un objeto. Se
+    distingue de un objeto cortado por el bloque leído porque el error queda
+    antes de un salto de línea: leer más no lo arregla.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8-sig') as f:
+        # `line` es el número de línea de buf[0].
+        buf, pos, line, started = '', 0, 1, False
+        while True:
+            # Saltar espacios y separadores entre objetos.
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buf) and buf[pos] == '[' and not started:
+                    started = True
+                    pos += 1
+                    continue
+                if pos < len(buf):
+                    break
+                more = f.read(block_size)
+                if not more:
+                    return
+                line += buf.count('\n', 0, pos)
+                buf, pos = buf[pos:] + more, 0
+            if buf[pos] == ']':
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                more = f.read(block_size) if buf.find('\n', e.pos) < 0 else ''
+                if more:
+                    line += buf.count('\n', 0, pos)
+                    buf, pos = buf[pos:] + more, 0
+                    continue
+                bad_line = line + buf.count('\n', 0, e.pos)
+                yield MalformedRecord(f'malformed JSON at line {bad_line}: {e.msg}')
+                pos = e.pos
+                while True:
+                    match = _NEXT_RECORD.search(buf, pos)
+                    if match:
+                        pos = match.end()
+                        break
+                    more = f.read(block_size)
+                    if not more:
+                        return
+                    # Conservar desde el último salto de línea: puede ser el inicio del siguiente objeto.
+                    cut = max(buf.rfind('\n', pos), pos)
+                    line += buf.count('\n', 0, cut)
+                    buf, pos = buf[cut:] + more, 0
+                continue
+            pos = end
+            yield obj
+
+
+_XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+def _column_index(ref):
+    index = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        index = index * 26 + ord(ch.upper()) - 64
+    return index - 1
+
+
+def _iter_children(f, parent_tag, tag):
+    """Elementos `tag` hijos de `parent_tag`, que se liberan al pedir el siguiente.
+
+    iterparse arma el árbol completo aunque se limpie cada elemento: los ya
+    leídos siguen colgando del padre. Vaciar el padre mantiene en memoria sólo
+    el elemento en curso.
+    """
+    parent = None
+    for event, elem in ElementTree.iterparse(f, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == parent_tag:
+                parent = elem
+        elif elem.tag == tag:
+            yield elem
+            elem.clear()
+            if parent is not None:
+                parent.clear()
+
+
+def read_xlsx(path):
+    """Filas de la primera hoja como dicts (la primera fila es el encabezado)."""
+    with zipfile.ZipFile(path) as zf:
+        shared = []
+        if 'xl/sharedStrings.xml' in zf.namelist():
+            with zf.open('xl/sharedStrings.xml') as f:
+                for elem in _iter_children(f, _XLSX_NS + 'sst', _XLSX_NS + 'si'):
+                    shared.append(''.join(t.text or '' for t in elem.iter(_XLSX_NS + 't')))
+        sheet = 'xl/worksheets/sheet1.xml'
+        if sheet not in zf.namelist():
+            sheet = sorted(n for n in zf.namelist() if n.startswith('xl/worksheets/') and n.endswith('.xml'))[0]
+        header = None
+        with zf.open(sheet) as f:
+            for elem in _iter_children(f, _XLSX_NS + 'sheetData', _XLSX_NS + 'row'):
+                values = {}
+                for cell in elem.iter(_XLSX_NS + 'c'):
+                    kind = cell.get('t')
+                    if kind == 'inlineStr':
+                        value = ''.join(t.text or '' for t in cell.iter(_XLSX_NS + 't'))
+                    else:
+                        value = cell.findtext(_XLSX_NS + 'v')
+                        if value is not None and kind == 's':
+                            value = shared[int(value)]
+                    values[_column_index(cell.get('r', ''))] = value
+                if header is None:
+                    header = {i: (v or '').strip() for i, v in values.items()}
+                    continue
+                yield {name: values.get(i) for i, name in header.items()}
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'ndjson': read_json, 'xlsx': read_xlsx}
+
+
+def normalize(record):
+    """Mapear los nombres de columna del volcado a los campos esperados."""
+    lowered = {str(k).strip().lower(): v for k, v in record.items()} if isinstance(record, dict) else {}
+    out = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            value = lowered.get(alias)
+            if value not in (None, ''):
+                out[field] = str(value).strip()
+                break
+    return out
+
+
+def parse_grade(text):
+    try:
+        grade = Decimal(text).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f'invalid grade {text!r}')
+    if not 0 <= grade <= 100:
+        raise ValueError(f'grade out of range {text!r}')
+    return grade
+
+
+def parse_graded_at(text):
+    if text is None:
+        return None
+    try:
+        # XLSX guarda las fechas como número de días desde 1899-12-30.
+        return _EXCEL_EPOCH + timedelta(days=float(text))
+    except OverflowError:
+        # inf, 1e400 o un número de días que se sale del rango de datetime.
+        raise ValueError(f'graded_at out of range {text!r}')
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text.replace('/', '-'))
+    except (ValueError, OverflowError):
+        raise ValueError(f'invalid graded_at {text!r}')
+
+
+# --- Índices precargados -------------------------------------------------------
+
+def load_lookup(conn):
+    """{(student_number, course_code): enrollment_id} con la matrícula más reciente."""
+    cur = conn.cursor()
+    cur.execute('SELECT id, student_number FROM students')
+    students = {number: sid for sid, number in cur.fetchall()}
+    cur.execute('SELECT id, code FROM courses')
+    courses = {code: cid for cid, code in cur.fetchall()}
+    enrollments = {}
+    cur.execute('SELECT id, student_id, course_id FROM enrollments ORDER BY id')
+    while True:
+        rows = cur.fetchmany(10000)
+        if not rows:
+            break
+        for eid, sid, cid in rows:
+            enrollments[(sid, cid)] = eid
+    cur.close()
+    return students, courses, enrollments
+
+
+def load_existing(conn, dedupe):
+    """Claves de deduplicación de las calificaciones ya guardadas."""
+    keys = set()
+    cur = conn.cursor()
+    cur.execute('SELECT enrollment_id, grade FROM grades')
+    while True:
+        rows = cur.fetchmany(10000)
+        if not rows:
+            break
+        for eid, grade in rows:
+            keys.add(dedupe_key(dedupe, eid, grade))
+    cur.close()
+    return keys
+
+
+def dedupe_key(dedupe, enrollment_id, grade):
+    if dedupe == 'enrollment':
+        return enrollment_id
+    return (enrollment_id, Decimal(grade).quantize(Decimal('0.01')) if grade is not None else None)
+
+
+# --- Checkpoint ----------------------------------------------------------------
+
+class Checkpoint:
+    """Bloques ya confirmados de un archivo, guardados de forma atómica en JSON."""
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.done = set()
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Cargar el progreso previo; False si no hay o si el archivo de origen cambió."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('fingerprint') != self.fingerprint:
+            raise SystemExit(f'El checkpoint {self.path} es de otro archivo o configuración; usa --restart.')
+        self.done = set(data.get('done', []))
+        self.totals = data.get('totals', {})
+        return True
+
+    def mark(self, chunk, counts):
+        with self._lock:
+            self.done.add(chunk)
+            for key, n in counts.items():
+                self.totals[key] = self.totals.get(key, 0) + n
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': self.fingerprint, 'done': sorted(self.done), 'totals': self.totals}, f)
+            os.replace(tmp, self.path)
+
+
+# --- Importación -----------------------------------------------------------------
+
+def insert_chunk(db_pool, rows):
+    """Insertar [(registro, valores)] en una transacción; devuelve {registro: id | excepción}."""
+    with db_pool.connection() as conn:
+        return GRADES_WITH_DATE.insert_many(conn, rows, chunk_size=len(rows) or 1)
+
+
+def import_file(path, url, fmt=None, workers=4, chunk_size=CHUNK_SIZE, dedupe='value',
+                checkpoint_path=None, errors_path=None, restart=False, progress=True):
+    """Importar `path` y devolver los totales (insertados, errores, duplicados...)."""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in READERS:
+        raise SystemExit(f'Formato no soportado: {fmt} (usa {", ".join(sorted(READERS))})')
+    checkpoint_path = checkpoint_path or path + '.checkpoint.json'
+    errors_path = errors_path or path + '.errors.csv'
+    stat = os.stat(path)
+    checkpoint = Checkpoint(checkpoint_path, dict(
+        file=os.path.abspath(path), size=stat.st_size, mtime=int(stat.st_mtime),
+        chunk_size=chunk_size, dedupe=dedupe))
+    resumed = False if restart else checkpoint.load()
+
+    db_pool = create_pool(url, size=workers + 1)
+    with db_pool.connection() as conn:
+        students, courses, enrollments = load_lookup(conn)
+        seen = load_existing(conn, dedupe)
+
+    report_exists = resumed and os.path.exists(errors_path)
+    report_file = open(errors_path, 'a' if report_exists else 'w', newline='', encoding='utf-8')
+    report = csv.DictWriter(report_file, REPORT_FIELDS)
+    if not report_exists:
+        report.writeheader()
+
+    started = time.perf_counter()
+    read = 0
+    last_report = [0.0]
+
+    def show(final=False):
+        now = time.perf_counter()
+        if not progress or (not final and now - last_report[0] < 1):
+            return
+        last_report[0] = now
+        t = checkpoint.totals
+        sys.stderr.write(f'\rregistros={read:,} insertados={t.get("inserted", 0):,} '
+                         f'duplicados={t.get("duplicates", 0):,} errores={t.get("errors", 0):,} '
+                         f'{read / (now - started) if now > started else 0:,.0f} reg/s   ')
+        if final:
+            sys.stderr.write('\n')
+        sys.stderr.flush()
+
+    def finish(chunk, raws, keys, repeated, problems, duplicates, future):
+        """Anotar el resultado de un bloque (en el hilo principal).
+
+        Las claves pasan a `seen` sólo si su INSERT confirmó: la copia
+        repetida de una fila que falló se inserta en su lugar.
+        """
+        inserted = 0
+        for record, outcome in future.result().items():
+            del in_flight[keys[record]]
+            if isinstance(outcome, Exception):
+                problems.append((record, raws[record], f'insert failed: {outcome}'))
+            else:
+                inserted += 1
+                seen.add(keys[record])
+        for record, raw, values, key in repeated:
+            if key in seen:
+                duplicates += 1
+                problems.append((record, raw, 'duplicate'))
+                continue
+            outcome = insert_chunk(db_pool, [(record, values)])[record]
+            if isinstance(outcome, Exception):
+                problems.append((record, raw, f'insert failed: {outcome}'))
+            else:
+                inserted += 1
+                seen.add(key)
+        for record, raw, error in sorted(problems, key=lambda p: p[0]):
+            report.writerow(dict(raw, record=record, error=error))
+        report_file.flush()
+        checkpoint.mark(chunk, dict(inserted=inserted, errors=len(problems) - duplicates,
+                                    duplicates=duplicates))
+
+    pending = deque()
+    # Clave -> bloque que la está insertando (todavía sin confirmar).
+    in_flight = {}
+    records = enumerate(READERS[fmt](path), start=1)
+    chunk = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = []
+            for item in records:
+                batch.append(item)
+                if len(batch) == chunk_size:
+                    break
+            if not batch:
+                break
+            chunk += 1
+            read += len(batch)
+            if chunk in checkpoint.done:
+                # Ya confirmado en una corrida anterior; sus claves están en `seen` desde la BD.
+                continue
+            rows, raws, keys, repeated, problems, duplicates = [], {}, {}, [], [], 0
+            for record, raw in batch:
+                fields = normalize(raw)
+                try:
+                    if isinstance(raw, MalformedRecord):
+                        raise raw
+                    if 'student_number' not in fields or 'course_code' not in fields or 'grade' not in fields:
+                        raise ValueError('missing student_number, course_code or grade')
+                    grade = parse_grade(fields['grade'])
+                    graded_at = parse_graded_at(fields.get('graded_at')) or datetime.now().replace(microsecond=0)
+                    student_id = students.get(fields['student_number'])
+                    if student_id is None:
+                        raise ValueError('unknown student_number')
+                    course_id = courses.get(fields['course_code'])
+                    if course_id is None:
+                        raise ValueError('unknown course_code')
+                    enrollment_id = enrollments.get((student_id, course_id))
+                    if enrollment_id is None:
+                        raise ValueError('student is not enrolled in course')
+                    key = dedupe_key(dedupe, enrollment_id, grade)
+                    # Si la otra copia está en un bloque anterior aún en vuelo, se
+                    # espera su resultado: sólo es duplicado si esa fila se insertó.
+                    while in_flight.get(key, chunk) != chunk:
+                        finish(*pending.popleft())
+                    if key in seen:
+                        duplicates += 1
+                        raise ValueError('duplicate')
+                except (ValueError, ArithmeticError) as e:
+                    problems.append((record, fields, str(e)))
+                    continue
+                if key in in_flight:
+                    # Repetida dentro del bloque: se decide en finish().
+                    repeated.append((record, fields, (enrollment_id, grade, graded_at), key))
+                    continue
+                in_flight[key] = chunk
+                rows.append((record, (enrollment_id, grade, graded_at)))
+                raws[record] = fields
+                keys[record] = key
+
+            future = executor.submit(insert_chunk, db_pool, rows)
+            pending.append((chunk, raws, keys, repeated, problems, duplicates, future))
+            # Límite de bloques en vuelo: la memoria no crece con el tamaño del archivo.
+            while len(pending) > workers * 2 or (pending and pending[0][-1].done()):
+                finish(*pending.popleft())
+                show()
+        while pending:
+            finish(*pending.popleft())
+    show(final=True)
+    report_file.close()
+    db_pool.close_all()
+    return dict(checkpoint.totals, records=read, resumed=resumed,
+                errors_file=errors_path, checkpoint=checkpoint_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importar calificaciones de volcados CSV/XLSX/JSON')
+    parser.add_argument('file')
+    parser.add_argument('--url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--format', choices=sorted(READERS), help='por defecto, según la extensión')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='registros por transacción')
+    parser.add_argument('--dedupe', choices=('value', 'enrollment'), default='value')
+    parser.add_argument('--checkpoint', help='por defecto ARCHIVO.checkpoint.json')
+    parser.add_argument('--errors', help='por defecto ARCHIVO.errors.csv')
+    parser.add_argument('--restart', action='store_true', help='ignorar el checkpoint y empezar de cero')
+    args = parser.parse_args()
+
+    if not args.url:
+        print('Error: No se proporcionó DATABASE_URL. Usa --url o define la variable de entorno.')
+        sys.exit(2)
+    totals = import_file(args.file, args.url, args.format, max(1, args.workers), args.chunk_size,
+                         args.dedupe, args.checkpoint, args.errors, args.restart)
+    print('Importación terminada:', totals)
+    if totals.get('errors'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Métricas de tiempos para los servicios SOAP y REST en formato Prometheus.
+
+Sin dependencias externas: un registro mínimo de contadores e histogramas con
+etiquetas, un middleware para Flask y la instrumentación del pool de
+conexiones (tiempo de obtener conexión, tiempo por consulta y log de consultas
+lentas).
+
+Uso en una app:
+    registry = MetricsRegistry()
+    db_pool.instrument = QueryTimer(registry)
+    init_app(app, registry)          # agrega GET /metrics
+
+Los valores son por proceso; con varios workers cada uno expone los suyos.
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import Response, g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+slow_query_log = logging.getLogger('uau.slow_query')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(n, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                     for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label_values -> [counts por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        names = self.labels + ('le',)
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{_format_labels(names, label_values + (bound,))} {count}')
+                lines.append(f'{self.name}_bucket{_format_labels(names, label_values + ("+Inf",))} {series[-1]}')
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f'{self.name}_sum{labels} {series[-2]}')
+                lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas de un proceso más colectores de valores instantáneos."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_gauges(self, prefix, help_text, read_values):
+        """Exponer como gauges el dict numérico que devuelve `read_values()` al renderizar."""
+        self._collectors.append((prefix, help_text, read_values))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, help_text, read_values in self._collectors:
+            for key, value in sorted(read_values().items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f'{prefix}_{key}'
+                    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+_STATEMENT = re.compile(r'^\s*(\w+)\b.*?\b(?:FROM|INTO|UPDATE)\s+`?(\w+)', re.I | re.S)
+
+
+def statement_label(sql):
+    """Etiqueta de baja cardinalidad para una consulta: 'SELECT enrollments'."""
+    m = _STATEMENT.match(sql)
+    if m:
+        return f'{m.group(1).upper()} {m.group(2).lower()}'
+    return sql.split(None, 1)[0].upper() if sql.strip() else 'EMPTY'
+
+
+class TimedCursor:
+    """Cursor que mide `execute`/`executemany` y las lecturas de filas."""
+
+    def __init__(self, raw, timer):
+        self._raw = raw
+        self._timer = timer
+        self._label = 'UNKNOWN'
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def _timed(self, phase, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._timer.observe(phase, self._label, time.perf_counter() - start, args[0] if phase != 'fetch' else None)
+
+    def execute(self, sql, params=()):
+        self._label = statement_label(sql)
+        return self._timed('query', self._raw.execute, sql, params)
+
+    def executemany(self, sql, seq_params):
+        self._label = statement_label(sql)
+        return self._timed('query', self._raw.executemany, sql, seq_params)
+
+    def fetchone(self):
+        return self._timed('fetch', self._raw.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._timed('fetch', self._raw.fetchmany, size)
+
+    def fetchall(self):
+        return self._timed('fetch', self._raw.fetchall)
+
+
+class QueryTimer:
+    """Instrumentación para `ConnectionPool.instrument`.
+
+    Registra el tiempo de espera por una conexión del pool, el tiempo de cada
+    consulta (por tipo y tabla) y el de lectura de filas, y escribe en el log
+    `uau.slow_query` las consultas que superan `slow_query_ms`
+    (variable SLOW_QUERY_MS, por defecto 500).
+    """
+
+    def __init__(self, registry, slow_query_ms=None):
+        if slow_query_ms is None:
+            slow_query_ms = float(os.environ.get('SLOW_QUERY_MS', 500))
+        self.slow_query_s = slow_query_ms / 1000
+        self.acquire = registry.histogram(
+            'db_pool_acquire_seconds', 'Tiempo esperando una conexión del pool')
+        self.queries = registry.histogram(
+            'db_query_duration_seconds', 'Tiempo de execute por tipo de sentencia y tabla', ('statement',))
+        self.fetches = registry.histogram(
+            'db_fetch_duration_seconds', 'Tiempo leyendo filas por tipo de sentencia y tabla', ('statement',))
+        self.slow = registry.counter(
+            'db_slow_queries_total', 'Consultas que superaron el umbral de consulta lenta', ('statement',))
+
+    def on_acquire(self, seconds):
+        self.acquire.observe(seconds)
+
+    def wrap_cursor(self, cursor):
+        return TimedCursor(cursor, self)
+
+    def observe(self, phase, label, seconds, sql):
+        if phase == 'fetch':
+            self.fetches.observe(seconds, label)
+            return
+        self.queries.observe(seconds, label)
+        if seconds >= self.slow_query_s:
+            self.slow.inc(label)
+            slow_query_log.warning('Consulta lenta (%.0f ms): %s', seconds * 1000, ' '.join(sql.split())[:500])
+
+
+def init_app(app, registry):
+    """Middleware de tiempos por endpoint y operación SOAP, más `GET /metrics`.
+
+    La duración y el tamaño se registran al cerrar la respuesta, así las
+    respuestas en streaming cuentan el tiempo hasta el último byte enviado.
+    Para desglosar un endpoint por operación, la vista asigna
+    `g.metrics_operation` (lo hace el servicio SOAP con el nombre de la operación).
+    """
+    requests_hist = registry.histogram(
+        'http_request_duration_seconds', 'Duración de las peticiones HTTP', ('method', 'endpoint', 'status'))
+    sizes_hist = registry.histogram(
+        'http_response_size_bytes', 'Tamaño de las respuestas HTTP', ('method', 'endpoint'), SIZE_BUCKETS)
+    operations_hist = registry.histogram(
+        'soap_operation_duration_seconds', 'Duración por operación SOAP', ('operation', 'status'))
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get('metrics_start')
+        if start is None:
+            return response
+        method = request.method
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        operation = g.get('metrics_operation')
+        status = str(response.status_code)
+
+        sent = [0]
+        if response.is_streamed:
+            inner = response.response
+
+            def counting():
+                try:
+                    for chunk in inner:
+                        sent[0] += len(chunk) if isinstance(chunk, bytes) else len(chunk.encode('utf-8'))
+                        yield chunk
+                finally:
+                    # propaga el cierre (cliente desconectado) al generador original
+                    if hasattr(inner, 'close'):
+                        inner.close()
+            response.response = counting()
+
+        def finish():
+            elapsed = time.perf_counter() - start
+            requests_hist.observe(elapsed, method, endpoint, status)
+            size = response.content_length if not response.is_streamed else sent[0]
+            sizes_hist.observe(size or 0, method, endpoint)
+            if operation:
+                operations_hist.observe(elapsed, operation, status)
+        response.call_on_close(finish)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
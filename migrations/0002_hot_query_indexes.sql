@@ -0,0 +1,9 @@
+-- Índices compuestos para las consultas frecuentes de los servicios:
+--   - GetEnrollments / GetEnrollmentsBatch filtran por student_id y la
+--     búsqueda de una matrícula concreta usa (student_id, course_id).
+--   - Las calificaciones se leen por enrollment_id en orden de graded_at.
+-- Reemplazan en la práctica a los índices simples que InnoDB crea para las FK.
+
+CREATE INDEX idx_enrollments_student_course ON enrollments (student_id, course_id);
+
+CREATE INDEX idx_grades_enrollment_graded ON grades (enrollment_id, graded_at);
@@ -0,0 +1,5 @@
+-- Índice para filtrar calificaciones por rango de fechas (exportación masiva
+-- con `from`/`to`); sin él el rango recorre toda la tabla grades.
+-- El filtro por curso usa el índice que InnoDB crea para la FK course_id.
+
+CREATE INDEX idx_grades_graded_at ON grades (graded_at);
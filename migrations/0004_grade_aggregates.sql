@@ -0,0 +1,27 @@
+-- Tablas de resumen de calificaciones (ver aggregates.py).
+-- Se actualizan en la misma transacción que cada INSERT en grades y se
+-- recalculan completas con `python aggregates.py --rebuild`.
+
+CREATE TABLE IF NOT EXISTS student_grade_stats (
+  student_id INT PRIMARY KEY,
+  grades_count INT NOT NULL DEFAULT 0,
+  graded_credits INT NOT NULL DEFAULT 0,
+  weighted_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+  FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS course_grade_stats (
+  course_id INT PRIMARY KEY,
+  grades_count INT NOT NULL DEFAULT 0,
+  grade_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+  FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+);
+
+-- Cantidad de calificaciones por curso y valor: mediana exacta y distribución.
+CREATE TABLE IF NOT EXISTS course_grade_counts (
+  course_id INT NOT NULL,
+  grade DECIMAL(5,2) NOT NULL,
+  grades INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (course_id, grade),
+  FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+);
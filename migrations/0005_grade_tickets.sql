@@ -0,0 +1,13 @@
+-- Tickets de la cola de escritura diferida de calificaciones
+-- (rest_service_py/grade_queue.py). Cada ticket se inserta en la misma
+-- transacción que su calificación: si el proceso cae después del commit, al
+-- reintentar el lote los tickets presentes indican qué ya quedó guardado.
+
+CREATE TABLE IF NOT EXISTS grade_tickets (
+  ticket CHAR(32) PRIMARY KEY,
+  grade_id INT NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (grade_id) REFERENCES grades(id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_grade_tickets_created ON grade_tickets (created_at);
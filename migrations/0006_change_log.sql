@@ -0,0 +1,13 @@
+-- Registro de cambios para el feed de /api/changes (ver changefeed.py).
+-- Cada INSERT en students, courses, enrollments y grades agrega aquí una fila
+-- en su misma transacción; `id` es el cursor del feed.
+
+CREATE TABLE IF NOT EXISTS change_log (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  table_name VARCHAR(30) NOT NULL,
+  row_id INT NOT NULL,
+  payload TEXT NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_change_log_created ON change_log (created_at);
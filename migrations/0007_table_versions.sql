@@ -0,0 +1,10 @@
+-- Versión por tabla para los ETag de los listados REST (rest_service_py/cache.py).
+-- Cada INSERT de storage.Entity incrementa la fila de su tabla en su misma
+-- transacción, justo antes del commit: todos los procesos (workers, asgi_app,
+-- import_grades.py) ven el mismo token en cuanto la escritura es visible.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+  table_name VARCHAR(30) PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at DATETIME(6) NOT NULL
+);
@@ -0,0 +1,10 @@
+-- Versión de cada tabla repartida en filas (storage.VERSION_SHARDS).
+-- Con una sola fila por tabla, cada INSERT la bloqueaba hasta su commit y los
+-- escritores concurrentes de la misma tabla se encolaban detrás, sin
+-- aprovechar el group commit. Ahora cada transacción incrementa una fila al
+-- azar y la versión es la suma; la fila existente queda como shard 0.
+
+ALTER TABLE table_versions
+  ADD COLUMN shard SMALLINT NOT NULL DEFAULT 0 AFTER table_name,
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (table_name, shard);
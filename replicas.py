@@ -0,0 +1,259 @@
+"""
+Separación de lecturas y escrituras entre el primario y réplicas de lectura.
+
+`DATABASE_URL` sigue siendo el primario; `DB_REPLICA_URLS` (URLs separadas por
+coma, mismo formato) agrega réplicas. `RoutingPool` tiene la misma interfaz
+que `db_pool.ConnectionPool` para el primario (`acquire`, `connection`,
+`stats`...), así que las escrituras no cambian; las lecturas piden
+`acquire_read()` o `read_connection()`:
+
+  - Se reparten en round-robin entre las réplicas sanas.
+  - Un hilo por proceso verifica cada `DB_REPLICA_CHECK_INTERVAL` segundos
+    cada réplica (conexión y retraso, ver `storage.replica_lag`). Una réplica
+    caída o con más de `DB_REPLICA_MAX_LAG` segundos de retraso deja de
+    recibir lecturas hasta el siguiente chequeo bueno; si ninguna sirve se lee
+    del primario. Si el retraso no se puede medir (el usuario no tiene
+    REPLICATION CLIENT o el servidor no es réplica) tampoco recibe lecturas,
+    salvo con `DB_REPLICA_ALLOW_UNKNOWN_LAG=1`.
+  - Lectura de lo propio: tras una escritura el cliente recibe la cookie
+    `db_primary_until` y durante `DB_STICKY_SECONDS` (por defecto el retraso
+    máximo más el intervalo de chequeo) sus lecturas van al primario. Ver
+    `init_app`.
+
+Sin `DB_REPLICA_URLS` todas las lecturas van al primario, como antes.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+from db_pool import PoolTimeout
+from storage import create_pool, replica_lag
+
+STICKY_COOKIE = 'db_primary_until'
+
+
+class Replica:
+    """Pool de una réplica más su estado según el último chequeo."""
+
+    def __init__(self, name, pool, probe):
+        self.name = name
+        self.pool = pool
+        # Conexión aparte para el chequeo: el pool puede estar ocupado con tráfico.
+        self.probe = probe
+        # Sin lecturas hasta el primer chequeo: el retraso es desconocido.
+        self.healthy = False
+        self.lag = None
+        self.error = 'sin verificar'
+        self.checked_at = None
+        self.reads = 0
+
+    def usable(self, max_lag, allow_unknown_lag=False):
+        if self.lag is None:
+            return self.healthy and allow_unknown_lag
+        return self.healthy and self.lag <= max_lag
+
+    def status(self, max_lag, allow_unknown_lag=False):
+        return dict(name=self.name, usable=self.usable(max_lag, allow_unknown_lag), healthy=self.healthy,
+                    lag=self.lag, error=self.error, checked_at=self.checked_at, reads=self.reads, pool=self.pool.stats())
+
+
+class RoutingPool:
+    """Primario para escrituras y réplicas en round-robin para lecturas."""
+
+    def __init__(self, primary, replicas=(), max_lag=5.0, check_interval=2.0, sticky_seconds=None,
+                 allow_unknown_lag=False):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        # Sin medir el retraso no se puede acotar cuán viejo es lo que se lee.
+        self.allow_unknown_lag = allow_unknown_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = max_lag + check_interval if sticky_seconds is None else sticky_seconds
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stop = threading.Event()
+        self._counts = dict(primary_reads=0, replica_reads=0, fallback_reads=0, replica_errors=0)
+
+    # --- Interfaz de ConnectionPool (primario) ---------------------------------
+
+    @property
+    def instrument(self):
+        return self.primary.instrument
+
+    @instrument.setter
+    def instrument(self, value):
+        for pool in [self.primary] + [r.pool for r in self.replicas]:
+            pool.instrument = value
+
+    def acquire(self):
+        return self.primary.acquire()
+
+    def connection(self):
+        return self.primary.connection()
+
+    def stats(self):
+        return self.primary.stats()
+
+    def close_all(self):
+        self._stop.set()
+        for pool in [self.primary] + [p for r in self.replicas for p in (r.pool, r.probe)]:
+            pool.close_all()
+
+    # --- Lecturas --------------------------------------------------------------
+
+    def acquire_read(self, primary=False):
+        """Conexión para leer: una réplica utilizable o, si no hay, el primario."""
+        if primary or not self.replicas:
+            self._count('primary_reads')
+            return self.primary.acquire()
+        self._ensure_checker()
+        candidates = [r for r in self.replicas if r.usable(self.max_lag, self.allow_unknown_lag)]
+        start = next(self._next)
+        for offset in range(len(candidates)):
+            replica = candidates[(start + offset) % len(candidates)]
+            try:
+                conn = replica.pool.acquire()
+            except PoolTimeout:
+                # Réplica ocupada, no caída: igual que con el primario.
+                raise
+            except Exception as e:
+                # Caída entre chequeos: se descarta ya y se prueba la siguiente.
+                self._mark_down(replica, e)
+                continue
+            with self._lock:
+                replica.reads += 1
+                self._counts['replica_reads'] += 1
+            return conn
+        self._count('fallback_reads')
+        return self.primary.acquire()
+
+    @contextmanager
+    def read_connection(self, primary=False):
+        """Como `connection()`, pero para lecturas (ver acquire_read)."""
+        conn = self.acquire_read(primary)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def replica_stats(self):
+        """Contadores de enrutamiento, numéricos (para /metrics)."""
+        with self._lock:
+            usable = sum(1 for r in self.replicas if r.usable(self.max_lag, self.allow_unknown_lag))
+            return dict(self._counts, replicas_total=len(self.replicas), replicas_usable=usable)
+
+    def routing_status(self):
+        """Estado detallado de cada réplica (para /pool/stats)."""
+        return dict(self.replica_stats(), max_lag=self.max_lag, sticky_seconds=self.sticky_seconds,
+                    allow_unknown_lag=self.allow_unknown_lag,
+                    replicas=[r.status(self.max_lag, self.allow_unknown_lag) for r in self.replicas])
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _mark_down(self, replica, error):
+        with self._lock:
+            replica.healthy = False
+            replica.error = str(error)
+            self._counts['replica_errors'] += 1
+
+    # --- Chequeos --------------------------------------------------------------
+
+    def _ensure_checker(self):
+        # Un hilo por proceso, arrancado en el primer uso (después del fork de serve.py).
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='replica-checker', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.check()
+            if self._stop.wait(self.check_interval):
+                return
+
+    def check(self):
+        """Verificar todas las réplicas y actualizar su estado."""
+        for replica in self.replicas:
+            try:
+                with replica.probe.connection() as conn:
+                    lag = replica_lag(conn)
+            except Exception as e:
+                if replica.healthy:
+                    print(f'replicas: {replica.name} fuera de servicio: {e}', file=sys.stderr)
+                self._mark_down(replica, e)
+                continue
+            with self._lock:
+                replica.healthy, replica.lag = True, lag
+                replica.error = 'retraso desconocido' if lag is None else None
+                replica.checked_at = time.time()
+
+
+def _display_name(url):
+    # Sin credenciales: el nombre aparece en /pool/stats y en los logs.
+    return url.rsplit('@', 1)[-1]
+
+
+def create_routing_pool(url, replica_urls=None, **overrides):
+    """RoutingPool con el primario `url` y las réplicas de DB_REPLICA_URLS (o `replica_urls`)."""
+    if replica_urls is None:
+        replica_urls = [u.strip() for u in os.environ.get('DB_REPLICA_URLS', '').split(',') if u.strip()]
+    replicas = [Replica(_display_name(u), create_pool(u, **overrides), create_pool(u, size=1, timeout=2))
+                for u in replica_urls]
+    sticky = os.environ.get('DB_STICKY_SECONDS')
+    return RoutingPool(
+        create_pool(url, **overrides), replicas,
+        max_lag=float(os.environ.get('DB_REPLICA_MAX_LAG', 5)),
+        check_interval=float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 2)),
+        sticky_seconds=float(sticky) if sticky else None,
+        allow_unknown_lag=os.environ.get('DB_REPLICA_ALLOW_UNKNOWN_LAG', '0') == '1',
+    )
+
+
+# --- Flask ---------------------------------------------------------------------
+
+def mark_write():
+    """Registrar que la petición escribe: el cliente leerá del primario por un rato."""
+    g.db_wrote = True
+
+
+def primary_reads():
+    """True si las lecturas de esta petición deben ir al primario."""
+    return g.get('db_wrote', False) or g.get('db_sticky', False)
+
+
+def init_app(app, pool):
+    """Cookie de lectura de lo propio para las peticiones que escriben.
+
+    Las vistas que escriben llaman `mark_write()` (lo hace `get_db()` de cada
+    servicio); la respuesta lleva la cookie con el instante hasta el que el
+    cliente lee del primario. Un cliente sin cookies sólo ve sus escrituras
+    cuando las réplicas las alcanzan (como mucho DB_REPLICA_MAX_LAG segundos).
+    """
+    if not pool.replicas:
+        return
+
+    @app.before_request
+    def read_sticky_cookie():
+        try:
+            g.db_sticky = float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            g.db_sticky = False
+
+    @app.after_request
+    def set_sticky_cookie(response):
+        if g.get('db_wrote'):
+            until = time.time() + pool.sticky_seconds
+            response.set_cookie(STICKY_COOKIE, f'{until:.3f}', max_age=int(pool.sticky_seconds) + 1,
+                                httponly=True, samesite='Lax')
+        return response
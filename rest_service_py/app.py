@@ -2,142 +2,645 @@
 Servicio REST en Python (Flask).
 Expone API para grades y students.
 """
+import atexit
+import itertools
 import os
-import re
-import mysql.connector
-from flask import Flask, jsonify, request
+import sys
+import threading
+import time
+from functools import wraps
+from flask import Flask, Response, g, jsonify, request, url_for
 
-app = Flask(__name__)
-
-
-def parse_mysql_url(url):
-    m = re.match(r'mysql://([^:]+):([^@]+)@([^:]+):(\d+)/(\w+)', url)
-    if not m:
-        raise ValueError('DATABASE_URL no válido')
-    return dict(user=m.group(1), password=m.group(2), host=m.group(3), port=int(m.group(4)), database=m.group(5))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import COURSES, GRADES, STUDENTS
+from replicas import create_routing_pool, init_app as init_replicas, mark_write, primary_reads
+from metrics import MetricsRegistry, QueryTimer, init_app as init_metrics
+from cache import MemoryBackend, ReadCache, TableVersions
+from records import course_values, grade_values, student_values
+from export_grades import FORMATS, export, filename, parse_filters
+from aggregates import course_stats, courses_summary, student_gpa
+from transcripts import transcript, transcripts
+from grade_queue import GradeQueue
+from changefeed import ChangeFeed, CursorExpired
+import formats
 
+app = Flask(__name__)
+# jsonify con orjson si está instalado (ver formats.py).
+formats.init_app(app)
 
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if not DATABASE_URL:
     raise RuntimeError('Setear variable de entorno DATABASE_URL')
-DB_CONFIG = parse_mysql_url(DATABASE_URL)
-DB_CONFIG['charset'] = 'utf8'
+# Escrituras al primario; lecturas a las réplicas de DB_REPLICA_URLS, si hay (ver replicas.py).
+db_pool = create_routing_pool(DATABASE_URL)
+
+metrics_registry = MetricsRegistry()
+db_pool.instrument = QueryTimer(metrics_registry)
+metrics_registry.add_gauges('db_pool', 'Estado del pool de conexiones', db_pool.stats)
+metrics_registry.add_gauges('db_routing', 'Lecturas por destino y réplicas utilizables', db_pool.replica_stats)
+init_metrics(app, metrics_registry)
+init_replicas(app, db_pool)
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('API_DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+STREAM_CHUNK_SIZE = 500
+BATCH_CHUNK_SIZE = int(os.environ.get('API_BATCH_CHUNK_SIZE', 1000))
+MAX_BATCH_ITEMS = int(os.environ.get('API_MAX_BATCH_ITEMS', 50000))
+MAX_TRANSCRIPT_IDS = int(os.environ.get('API_MAX_TRANSCRIPT_IDS', 5000))
+
+# Caché de lectura de los catálogos (CACHE_TABLES vacío lo desactiva).
+read_cache = ReadCache(
+    MemoryBackend(max_bytes=int(os.environ.get('CACHE_MAX_BYTES', 32 * 1024 * 1024))),
+    ttl=float(os.environ.get('CACHE_TTL', 30)),
+    namespaces=set(filter(None, os.environ.get('CACHE_TABLES', 'courses,students').split(','))),
+    settle=db_pool.sticky_seconds if db_pool.replicas else 0.0,
+)
+# Versiones por tabla para ETag/Last-Modified, leídas de la BD (ver conditional_get).
+table_versions = TableVersions()
+# La clave del caché incluye la versión: una escritura de otro proceso (otro
+# worker, asgi_app.py, import_grades.py) no deja servir la respuesta anterior.
+# Sin versión (falló la consulta) no se usa el caché.
+read_cache.bypass_if(lambda: 'table_version' not in g)
+read_cache.vary_by(lambda: g.table_version)
+# Quien acaba de escribir no lee del caché: pudo llenarse desde una réplica atrasada.
+read_cache.bypass_if(primary_reads)
+# Una entrada por formato negociado (JSON, columnar, MessagePack).
+read_cache.vary_by(lambda: response_type())
+metrics_registry.add_gauges('read_cache', 'Estado del caché de lectura', read_cache.stats)
+
+# Feed de cambios (ver changefeed.py); cada escritura de este proceso lo despierta.
+change_feed = ChangeFeed(
+    db_pool,
+    capacity=int(os.environ.get('CHANGES_BUFFER', 10000)),
+    poll_interval=float(os.environ.get('CHANGES_POLL_INTERVAL', 1)),
+    gap_grace=float(os.environ.get('CHANGES_GAP_GRACE', 5)),
+    retention_days=int(os.environ.get('CHANGES_RETENTION_DAYS', 7)),
+)
+read_cache.on_invalidate(lambda namespace: change_feed.notify())
+metrics_registry.add_gauges('change_feed', 'Estado del feed de cambios', change_feed.stats)
+FEED_TABLES = ('students', 'courses', 'enrollments', 'grades')
+MAX_CHANGES_LIMIT = 5000
+MAX_LONG_POLL = 60
+# Cada stream SSE ocupa un hilo del worker: se acotan y se cierran cada tanto
+# (el cliente reconecta solo con Last-Event-ID).
+stream_slots = threading.BoundedSemaphore(int(os.environ.get('CHANGES_MAX_STREAMS', 16)))
+# Un long-poll en espera también ocupa un hilo hasta `timeout`: se acotan para
+# que los clientes del feed no dejen sin hilos al resto de la API.
+poll_slots = threading.BoundedSemaphore(int(os.environ.get('CHANGES_MAX_POLLERS', 32)))
+POLL_RETRY_AFTER = 5
+STREAM_SECONDS = float(os.environ.get('CHANGES_STREAM_SECONDS', 300))
+STREAM_HEARTBEAT = 15
+
+# Escritura diferida de POST /api/grades (ver grade_queue.py); desactivada por defecto.
+grade_queue = None
+if os.environ.get('GRADES_WRITE_BEHIND') == '1':
+    grade_queue = GradeQueue(
+        os.environ.get('GRADE_QUEUE_PATH', 'grade_queue.db'), db_pool,
+        batch_size=int(os.environ.get('GRADE_QUEUE_BATCH', 500)),
+        max_delay=float(os.environ.get('GRADE_QUEUE_DELAY', 0.2)),
+        retention_days=int(os.environ.get('GRADE_QUEUE_RETENTION_DAYS', 7)),
+        on_flush=lambda: read_cache.invalidate('grades'),
+    )
+    metrics_registry.add_gauges('grade_queue', 'Estado de la cola de calificaciones', grade_queue.stats)
+    atexit.register(grade_queue.close)
+
+    @app.before_request
+    def start_grade_queue():
+        # El hilo se arranca en cada worker, no en el maestro de serve.py --preload.
+        grade_queue.ensure_started()
 
 
 def get_db():
-    return mysql.connector.connect(**DB_CONFIG)
+    """Conexión al primario asociada a la petición actual (para escribir)."""
+    mark_write()
+    conn = g.get('db')
+    if conn is None or not conn.checked_out:
+        conn = g.db = db_pool.acquire()
+    return conn
+
+
+def get_read_db():
+    """Conexión de lectura de la petición: una réplica, o el primario tras una escritura."""
+    conn = g.get('read_db')
+    if conn is None or not conn.checked_out:
+        conn = g.read_db = db_pool.acquire_read(primary_reads())
+    return conn
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    # Devuelve las conexiones al pool aunque el handler haya fallado antes de cerrarlas.
+    for key in ('db', 'read_db'):
+        conn = g.pop(key, None)
+        if conn is not None:
+            conn.close()
+
+
+@app.route('/pool/stats', methods=['GET'])
+def pool_stats():
+    return jsonify(dict(db_pool.stats(), routing=db_pool.routing_status()))
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(read_cache.stats())
+
+
+def response_type():
+    """Formato de respuesta pedido en `Accept` (ver formats.py)."""
+    return formats.negotiate(request.accept_mimetypes)
+
+
+def conditional_get(table):
+    """Decorador para listados: ETag/Last-Modified y 304 sin ejecutar la vista.
+
+    Si el cliente envía `If-None-Match` (o `If-Modified-Since`) y la versión
+    de la tabla no cambió, se responde 304 sin consultar ni serializar filas.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                cur = get_read_db().cursor()
+                token, modified = table_versions.current(cur, table)
+                cur.close()
+                g.table_version = token
+                if response_type() != formats.JSON:
+                    # Cada formato es una representación distinta: su propio ETag.
+                    token = f'{token}-{response_type().rsplit("/", 1)[1]}'
+            except Exception:
+                # Sin versión no hay respuesta condicional; la vista reporta el error.
+                return view(*args, **kwargs)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(token)
+            else:
+                since = request.if_modified_since
+                not_modified = since is not None and modified <= since
+            if not_modified:
+                resp = Response(status=304)
+            else:
+                resp = app.make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(token, weak=True)
+            resp.last_modified = modified
+            return resp
+        return wrapper
+    return decorator
+
+
+def stream_json_rows(entity, after=None, fields=None, filters=None):
+    """Responder un arreglo JSON escrito por bloques desde un cursor sin buffer.
+
+    Usa su propia conexión del pool: la de la petición se libera en el teardown,
+    antes de que el generador termine de enviar la respuesta.
+    """
+    primary = primary_reads()
+
+    def generate():
+        with db_pool.read_connection(primary) as conn:
+            yield '['
+            sep = ''
+            for rows in entity.stream(conn, after, STREAM_CHUNK_SIZE, fields, filters):
+                yield sep + ','.join(app.json.dumps(row) for row in rows)
+                sep = ','
+            yield ']'
+
+    return Response(generate(), mimetype='application/json')
+
+
+def render_rows(rows, columns):
+    """Respuesta con las filas en el formato negociado."""
+    mimetype = response_type()
+    if mimetype == formats.JSON:
+        resp = jsonify(rows)
+    else:
+        resp = Response(formats.encode(mimetype, rows, columns), mimetype=mimetype)
+    resp.vary.add('Accept')
+    return resp
+
+
+def list_rows(entity):
+    """Listado de una tabla con paginación por cursor (keyset sobre `id`).
+
+    Parámetros de consulta:
+      - `limit`: tamaño de página (máximo MAX_PAGE_SIZE).
+      - `after`: devolver sólo filas con `id` mayor a este valor.
+      - `stream=1`: enviar todas las filas restantes por bloques, sin paginar.
+      - `fields`: columnas a devolver separadas por comas (`id` siempre va).
+      - Filtros propios de cada recurso (ver `filters` de cada entidad en
+        storage.py), aplicados en el WHERE de la consulta.
+    Sin `limit` ni `after` se devuelve la tabla completa (filtrada), como antes.
+    La página siguiente se indica en las cabeceras `Link` y `X-Next-Cursor`.
+    El formato (JSON, columnar o MessagePack) se negocia con `Accept`, salvo
+    con `stream=1`, que siempre es JSON.
+    """
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    fields = request.args.get('fields')
+    try:
+        # Validar campos y filtros antes de empezar a responder (stream=1).
+        entity.query(fields, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if request.args.get('stream') in ('1', 'true'):
+        return stream_json_rows(entity, after, fields, request.args)
+
+    if after is None and limit is None:
+        conn = get_read_db()
+        rows = entity.all(conn, fields, request.args)
+        conn.close()
+        return render_rows(rows, entity.projection(fields))
+
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    conn = get_read_db()
+    rows = entity.page(conn, after, limit, fields, request.args)
+    conn.close()
+
+    resp = render_rows(rows, entity.projection(fields))
+    if len(rows) == limit:
+        next_cursor = rows[-1]['id']
+        # La página siguiente conserva los filtros y campos pedidos.
+        next_url = url_for(request.endpoint, **dict(request.args.items(), after=next_cursor, limit=limit))
+        resp.headers['Link'] = f'<{next_url}>; rel="next"'
+        resp.headers['X-Next-Cursor'] = str(next_cursor)
+    return resp
+
+
+def insert_batch(entity, rows):
+    """Insertar `rows` [(índice, valores)] en bloques de BATCH_CHUNK_SIZE.
+
+    Ver `Entity.insert_many`. Devuelve {índice: {'id': ...} | {'error': ...}}.
+    """
+    conn = get_db()
+    results = entity.insert_many(conn, rows, BATCH_CHUNK_SIZE)
+    conn.close()
+    return {index: {'index': index, 'error': str(r)} if isinstance(r, Exception) else {'id': r}
+            for index, r in results.items()}
+
+
+def create_one(entity, to_values):
+    """Handler común de los POST de un solo elemento."""
+    try:
+        values = to_values(request.get_json())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db()
+    new_id = entity.insert(conn, values)
+    conn.close()
+    return jsonify({'id': new_id}), 201
+
+
+def create_batch(entity, to_values):
+    """Handler común de los endpoints /batch: valida todo el arreglo y lo inserta.
+
+    Responde 201 si se crearon todos los elementos o 207 con el resultado de
+    cada uno (en el mismo orden que la entrada) si alguno falló.
+    """
+    items = request.get_json()
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a JSON array'}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({'error': f'Too many items (max {MAX_BATCH_ITEMS})'}), 413
+
+    results = {}
+    rows = []
+    for index, item in enumerate(items):
+        try:
+            rows.append((index, to_values(item)))
+        except ValueError as e:
+            results[index] = {'index': index, 'error': str(e)}
+    results.update(insert_batch(entity, rows))
+
+    ordered = [results[index] for index in range(len(items))]
+    created = sum(1 for r in ordered if 'id' in r)
+    status = 201 if created == len(items) else 207
+    return jsonify({'created': created, 'failed': len(items) - created, 'results': ordered}), status
 
 
 @app.route('/api/grades', methods=['GET'])
+@conditional_get('grades')
+@read_cache.cached('grades')
 def list_grades():
     try:
-        conn = get_db()
-        cur = conn.cursor(dictionary=True)
-        cur.execute('SELECT id, enrollment_id, grade FROM grades')
-        grades = cur.fetchall()
-        cur.close()
-        conn.close()
-        return jsonify(grades)
+        return list_rows(GRADES)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/grades/export', methods=['GET'])
+def export_grades():
+    """Exportación completa de calificaciones con datos de estudiante y curso.
+
+    Parámetros: `format` (csv, ndjson o xlsx), `gzip=1`, `course_id`,
+    `course_code`, `from` y `to` (sobre graded_at). Se envía en streaming desde
+    un cursor sin buffer con su propia conexión del pool.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'error': f'Unsupported format (use {", ".join(sorted(FORMATS))})'}), 400
+    compress = request.args.get('gzip') in ('1', 'true')
+    try:
+        filters = parse_filters(request.args.get('course_id'), request.args.get('course_code'),
+                                request.args.get('from'), request.args.get('to'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    primary = primary_reads()
+
+    def generate():
+        with db_pool.read_connection(primary) as conn:
+            yield from export(conn, fmt, filters, compress)
+
+    try:
+        chunks = generate()
+        # El primer bloque se produce aquí para que un error de consulta sea un 500.
+        first = next(chunks, b'')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    resp = Response(itertools.chain([first], chunks),
+                    mimetype='application/gzip' if compress else FORMATS[fmt][0])
+    resp.headers['Content-Disposition'] = f'attachment; filename="{filename(fmt, compress)}"'
+    return resp
+
+
 @app.route('/api/grades', methods=['POST'])
+@read_cache.invalidates('grades')
 def create_grade():
     try:
-        data = request.get_json()
-        enrollment_id = data.get('enrollment_id')
-        grade = data.get('grade')
-        
-        if not enrollment_id or grade is None:
-            return jsonify({'error': 'Missing enrollment_id or grade'}), 400
-        
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute('INSERT INTO grades (enrollment_id, grade) VALUES (%s, %s)', (enrollment_id, grade))
-        conn.commit()
-        new_id = cur.lastrowid
-        cur.close()
-        conn.close()
-        return jsonify({'id': new_id}), 201
+        if grade_queue is not None:
+            return enqueue_grade()
+        return create_one(GRADES, grade_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def enqueue_grade():
+    """POST /api/grades con escritura diferida: 202 y un ticket para consultar."""
+    try:
+        values = grade_values(request.get_json())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    ticket = grade_queue.append(*values)
+    # Sin get_db(): se marca a mano para que el cliente lea del primario al confirmarse.
+    mark_write()
+    status_url = url_for('grade_ticket', ticket=ticket)
+    return jsonify({'ticket': ticket, 'status': 'queued', 'status_url': status_url}), 202, {'Location': status_url}
+
+
+@app.route('/api/grades/tickets/<ticket>', methods=['GET'])
+def grade_ticket(ticket):
+    """Estado de una calificación encolada: queued, persisted (con grade_id) o failed."""
+    if grade_queue is None:
+        return jsonify({'error': 'Write-behind mode is disabled'}), 404
+    try:
+        status = grade_queue.status(ticket)
+        if status is None:
+            # Purgado de la cola local (o encolado en otro host): la BD tiene la última palabra.
+            grade_id = grade_queue.persisted_ticket(get_read_db(), ticket)
+            if grade_id is None:
+                return jsonify({'error': 'Ticket not found'}), 404
+            status = {'ticket': ticket, 'status': 'persisted', 'grade_id': grade_id}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify(status)
+
+
+@app.route('/api/grades/batch', methods=['POST'])
+@read_cache.invalidates('grades')
+def create_grades_batch():
+    try:
+        return create_batch(GRADES, grade_values)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/students', methods=['GET'])
+@conditional_get('students')
+@read_cache.cached('students')
 def list_students():
     try:
-        conn = get_db()
-        cur = conn.cursor(dictionary=True)
-        cur.execute('SELECT id, student_number, first_name, last_name, email FROM students')
-        students = cur.fetchall()
-        cur.close()
-        conn.close()
-        return jsonify(students)
+        return list_rows(STUDENTS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/students/<int:student_id>/gpa', methods=['GET'])
+@conditional_get('grades')
+@read_cache.cached('grades')
+def get_student_gpa(student_id):
+    """Promedio ponderado por créditos, leído de la tabla de resumen."""
+    try:
+        result = student_gpa(get_read_db(), student_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if result is None:
+        return jsonify({'error': 'Student not found'}), 404
+    return jsonify(result)
+
+
+@app.route('/api/students/<int:student_id>/transcript', methods=['GET'])
+def get_transcript(student_id):
+    """Kárdex: matrículas con datos del curso y calificaciones, en una sola consulta."""
+    try:
+        result = transcript(get_read_db(), student_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if result is None:
+        return jsonify({'error': 'Student not found'}), 404
+    return jsonify(result)
+
+
+@app.route('/api/students/transcripts', methods=['GET', 'POST'])
+def get_transcripts():
+    """Kárdex de varios estudiantes para reportes masivos.
+
+    GET `?ids=1,2,3` o POST con un arreglo JSON de ids (para listas largas).
+    Devuelve los kárdex en el orden pedido y en `missing` los ids inexistentes.
+    """
+    try:
+        if request.method == 'POST':
+            ids = request.get_json(silent=True)
+            if not isinstance(ids, list):
+                return jsonify({'error': 'Expected a JSON array of student ids'}), 400
+        else:
+            ids = [v for v in request.args.get('ids', '').split(',') if v.strip()]
+        ids = [int(v) for v in ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Student ids must be integers'}), 400
+    if not ids:
+        return jsonify({'error': 'No student ids given'}), 400
+    if len(ids) > MAX_TRANSCRIPT_IDS:
+        return jsonify({'error': f'Too many students (max {MAX_TRANSCRIPT_IDS})'}), 413
+    try:
+        found = transcripts(get_read_db(), ids)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    ids = list(dict.fromkeys(ids))
+    return jsonify({'transcripts': [found[i] for i in ids if i in found],
+                    'missing': [i for i in ids if i not in found]})
+
+
 @app.route('/api/students', methods=['POST'])
+@read_cache.invalidates('students')
 def create_student():
     try:
-        data = request.get_json()
-        student_number = data.get('student_number')
-        first_name = data.get('first_name')
-        last_name = data.get('last_name')
-        email = data.get('email')
-        
-        if not student_number or not first_name or not last_name:
-            return jsonify({'error': 'Missing required fields'}), 400
-        
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute('INSERT INTO students (student_number, first_name, last_name, email) VALUES (%s, %s, %s, %s)',
-                   (student_number, first_name, last_name, email))
-        conn.commit()
-        new_id = cur.lastrowid
-        cur.close()
-        conn.close()
-        return jsonify({'id': new_id}), 201
+        return create_one(STUDENTS, student_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/students/batch', methods=['POST'])
+@read_cache.invalidates('students')
+def create_students_batch():
+    try:
+        return create_batch(STUDENTS, student_values)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/courses', methods=['GET'])
+@conditional_get('courses')
+@read_cache.cached('courses')
 def list_courses():
     try:
-        conn = get_db()
-        cur = conn.cursor(dictionary=True)
-        cur.execute('SELECT id, code, name, credits FROM courses')
-        courses = cur.fetchall()
-        cur.close()
-        conn.close()
-        return jsonify(courses)
+        return list_rows(COURSES)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/courses/stats', methods=['GET'])
+@conditional_get('grades')
+@read_cache.cached('grades')
+def list_course_stats():
+    try:
+        return jsonify(courses_summary(get_read_db()))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/courses/<int:course_id>/stats', methods=['GET'])
+@conditional_get('grades')
+@read_cache.cached('grades')
+def get_course_stats(course_id):
+    """Media, mediana y distribución de calificaciones de un curso."""
+    try:
+        result = course_stats(get_read_db(), course_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if result is None:
+        return jsonify({'error': 'Course not found'}), 404
+    return jsonify(result)
+
+
 @app.route('/api/courses', methods=['POST'])
+@read_cache.invalidates('courses')
 def create_course():
     try:
-        data = request.get_json()
-        code = data.get('code')
-        name = data.get('name')
-        credits = data.get('credits', 3)
-        
-        if not code or not name:
-            return jsonify({'error': 'Missing code or name'}), 400
-        
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute('INSERT INTO courses (code, name, credits) VALUES (%s, %s, %s)', (code, name, credits))
-        conn.commit()
-        new_id = cur.lastrowid
-        cur.close()
-        conn.close()
-        return jsonify({'id': new_id}), 201
+        return create_one(COURSES, course_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/courses/batch', methods=['POST'])
+@read_cache.invalidates('courses')
+def create_courses_batch():
+    try:
+        return create_batch(COURSES, course_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def feed_params():
+    """cursor, tablas y límite de /api/changes y /api/changes/stream.
+
+    Sin `cursor` (ni cabecera Last-Event-ID) se empieza desde ahora.
+    """
+    raw = request.args.get('cursor') or request.headers.get('Last-Event-ID')
+    try:
+        cursor = change_feed.head() if raw is None else int(raw)
+        limit = int(request.args.get('limit', 500))
+    except ValueError:
+        raise ValueError('cursor and limit must be integers')
+    if cursor < 0:
+        raise ValueError('cursor must be >= 0')
+    tables = request.args.get('tables')
+    tables = set(tables.split(',')) if tables else None
+    if tables and not tables <= set(FEED_TABLES):
+        raise ValueError(f'tables must be a subset of {",".join(FEED_TABLES)}')
+    return cursor, tables, min(max(limit, 1), MAX_CHANGES_LIMIT)
+
+
+@app.route('/api/changes', methods=['GET'])
+def list_changes():
+    """Long-poll del feed: cambios posteriores a `cursor`, esperando hasta `timeout` s si no hay.
+
+    Responde `{"changes": [...], "cursor": N}`; la siguiente llamada pasa ese
+    cursor. 410 si el cursor es más viejo que lo que conserva el registro; 503
+    si ya hay `CHANGES_MAX_POLLERS` esperando (con `timeout=0` no se espera).
+    """
+    try:
+        cursor, tables, limit = feed_params()
+        timeout = min(max(float(request.args.get('timeout', 25)), 0), MAX_LONG_POLL)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    waits = timeout > 0
+    if waits and not poll_slots.acquire(blocking=False):
+        return (jsonify({'error': 'Too many waiting long-polls, retry later'}), 503,
+                {'Retry-After': str(POLL_RETRY_AFTER)})
+    try:
+        events, cursor = change_feed.changes(cursor, limit, timeout, tables)
+    except CursorExpired as e:
+        return jsonify({'error': str(e)}), 410
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if waits:
+            poll_slots.release()
+    body = f'{{"changes":[{",".join(event for _, event in events)}],"cursor":{cursor}}}'
+    return Response(body, mimetype='application/json', headers={'X-Next-Cursor': str(cursor)})
+
+
+@app.route('/api/changes/stream', methods=['GET'])
+def stream_changes():
+    """El mismo feed como Server-Sent Events; `id` de cada evento es su cursor."""
+    try:
+        cursor, tables, limit = feed_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if not stream_slots.acquire(blocking=False):
+        return (jsonify({'error': 'Too many open streams, use GET /api/changes'}), 503,
+                {'Retry-After': str(STREAM_HEARTBEAT)})
+
+    def generate(cursor):
+        yield 'retry: 3000\n\n'
+        deadline = time.monotonic() + STREAM_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                events, cursor = change_feed.changes(cursor, limit, STREAM_HEARTBEAT, tables)
+            except CursorExpired as e:
+                yield f'event: expired\ndata: {app.json.dumps({"error": str(e)})}\n\n'
+                return
+            for event_cursor, event in events:
+                yield f'id: {event_cursor}\ndata: {event}\n\n'
+            if not events or events[-1][0] != cursor:
+                # Sin datos no se dispara un evento, pero el cliente guarda el cursor
+                # (sirve también de latido).
+                yield f'id: {cursor}\n\n'
+
+    resp = Response(generate(cursor), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    # Se libera al cerrar la respuesta, aunque el cliente corte antes de empezar.
+    resp.call_on_close(stream_slots.release)
+    return resp
 
 
 if __name__ == '__main__':
@@ -0,0 +1,262 @@
+"""
+Servicio REST asíncrono (Quart + aiomysql).
+Mismos endpoints y contratos JSON que app.py, pero las peticiones esperan a la
+base de datos sin bloquear un hilo: un solo proceso mantiene cientos de
+consultas en vuelo, limitado sólo por el pool asíncrono.
+
+Ejecutar con un servidor ASGI, por ejemplo:
+  hypercorn --bind 0.0.0.0:5002 rest_service_py.asgi_app:app
+o directamente `python rest_service_py/asgi_app.py` (puerto 5002).
+
+Las escrituras van por el mismo camino que app.py (`storage.Entity`: tablas
+de resumen de calificaciones, change_log y versión de la tabla en la misma
+transacción) en hilos aparte, con un pool síncrono de ASYNC_WRITE_POOL_SIZE
+conexiones (por defecto 10).
+
+Variables: DATABASE_URL, ASYNC_DB_POOL_SIZE (por defecto 50),
+ASYNC_WRITE_POOL_SIZE y las mismas API_* de paginación y lotes que app.py.
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import aiomysql
+from quart import Quart, Response, jsonify, request, url_for
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db_pool import parse_mysql_url
+from storage import COURSES, GRADES, STUDENTS, create_pool
+import formats
+from records import course_values, grade_values, student_values
+
+app = Quart(__name__)
+formats.init_app(app)
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+if not DATABASE_URL:
+    raise RuntimeError('Setear variable de entorno DATABASE_URL')
+DB_CONFIG = parse_mysql_url(DATABASE_URL)
+
+POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 50))
+DEFAULT_PAGE_SIZE = int(os.environ.get('API_DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+STREAM_CHUNK_SIZE = 500
+BATCH_CHUNK_SIZE = int(os.environ.get('API_BATCH_CHUNK_SIZE', 1000))
+MAX_BATCH_ITEMS = int(os.environ.get('API_MAX_BATCH_ITEMS', 50000))
+
+db_pool = None
+
+# Un hilo por conexión de escritura: ningún hilo espera al pool.
+WRITE_POOL_SIZE = int(os.environ.get('ASYNC_WRITE_POOL_SIZE', 10))
+write_pool = create_pool(DATABASE_URL, size=WRITE_POOL_SIZE)
+write_executor = ThreadPoolExecutor(WRITE_POOL_SIZE, thread_name_prefix='asgi-write')
+
+
+@app.before_serving
+async def open_pool():
+    global db_pool
+    db_pool = await aiomysql.create_pool(
+        minsize=1, maxsize=POOL_SIZE, pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        host=DB_CONFIG['host'], port=DB_CONFIG['port'], user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'], db=DB_CONFIG['database'], charset='utf8',
+    )
+
+
+@app.after_serving
+async def close_pool():
+    db_pool.close()
+    await db_pool.wait_closed()
+    write_executor.shutdown()
+    write_pool.close_all()
+
+
+def _insert_one(entity, values):
+    with write_pool.connection() as conn:
+        return entity.insert(conn, values)
+
+
+def _insert_many(entity, rows):
+    with write_pool.connection() as conn:
+        return entity.insert_many(conn, rows, BATCH_CHUNK_SIZE)
+
+
+async def run_write(func, *args):
+    """Ejecutar una escritura de `storage` en el pool de hilos sin bloquear el loop."""
+    return await asyncio.get_running_loop().run_in_executor(write_executor, func, *args)
+
+
+@app.route('/pool/stats', methods=['GET'])
+async def pool_stats():
+    return jsonify(dict(size=db_pool.maxsize, open=db_pool.size, idle=db_pool.freesize,
+                        in_use=db_pool.size - db_pool.freesize))
+
+
+def stream_json_rows(sql, params=()):
+    """Arreglo JSON escrito por bloques desde un cursor sin buffer (SSDictCursor)."""
+    async def generate():
+        async with db_pool.acquire() as conn:
+            async with conn.cursor(aiomysql.SSDictCursor) as cur:
+                await cur.execute(sql, params)
+                yield b'['
+                sep = ''
+                while True:
+                    rows = await cur.fetchmany(STREAM_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    yield (sep + ','.join(app.json.dumps(row) for row in rows)).encode('utf-8')
+                    sep = ','
+                yield b']'
+
+    return Response(generate(), mimetype='application/json')
+
+
+async def list_rows(entity):
+    """Igual que `list_rows` de app.py: `limit`, `after`, `stream=1`, `fields`, filtros y `Accept`."""
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    try:
+        sql, params = entity.query(request.args.get('fields'), request.args, after)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if request.args.get('stream') in ('1', 'true'):
+        return stream_json_rows(sql + ' ORDER BY id', params)
+
+    paginate = after is not None or limit is not None
+    if paginate:
+        limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+        sql, params = sql + ' ORDER BY id LIMIT %s', params + (limit,)
+
+    async with db_pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(sql, params)
+            rows = await cur.fetchall()
+
+    mimetype = formats.negotiate(request.accept_mimetypes)
+    if mimetype == formats.JSON:
+        resp = jsonify(rows)
+    else:
+        resp = Response(formats.encode(mimetype, rows, entity.projection(request.args.get('fields'))),
+                        mimetype=mimetype)
+    resp.vary.add('Accept')
+    if paginate and len(rows) == limit:
+        next_cursor = rows[-1]['id']
+        next_url = url_for(request.endpoint, **dict(request.args.items(), after=next_cursor, limit=limit))
+        resp.headers['Link'] = f'<{next_url}>; rel="next"'
+        resp.headers['X-Next-Cursor'] = str(next_cursor)
+    return resp
+
+
+async def create_one(entity, to_values):
+    try:
+        values = to_values(await request.get_json())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    new_id = await run_write(_insert_one, entity, values)
+    return jsonify({'id': new_id}), 201
+
+
+async def create_batch(entity, to_values):
+    """Igual que `create_batch` de app.py: 201 o 207 con el resultado por elemento."""
+    items = await request.get_json()
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a JSON array'}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({'error': f'Too many items (max {MAX_BATCH_ITEMS})'}), 413
+
+    results = {}
+    rows = []
+    for index, item in enumerate(items):
+        try:
+            rows.append((index, to_values(item)))
+        except ValueError as e:
+            results[index] = {'index': index, 'error': str(e)}
+
+    inserted = await run_write(_insert_many, entity, rows)
+    results.update({index: {'index': index, 'error': str(r)} if isinstance(r, Exception) else {'id': r}
+                    for index, r in inserted.items()})
+
+    ordered = [results[index] for index in range(len(items))]
+    created = sum(1 for r in ordered if 'id' in r)
+    status = 201 if created == len(items) else 207
+    return jsonify({'created': created, 'failed': len(items) - created, 'results': ordered}), status
+
+
+@app.route('/api/grades', methods=['GET'])
+async def list_grades():
+    try:
+        return await list_rows(GRADES)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/grades', methods=['POST'])
+async def create_grade():
+    try:
+        return await create_one(GRADES, grade_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/grades/batch', methods=['POST'])
+async def create_grades_batch():
+    try:
+        return await create_batch(GRADES, grade_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/students', methods=['GET'])
+async def list_students():
+    try:
+        return await list_rows(STUDENTS)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/students', methods=['POST'])
+async def create_student():
+    try:
+        return await create_one(STUDENTS, student_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/students/batch', methods=['POST'])
+async def create_students_batch():
+    try:
+        return await create_batch(STUDENTS, student_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/courses', methods=['GET'])
+async def list_courses():
+    try:
+        return await list_rows(COURSES)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/courses', methods=['POST'])
+async def create_course():
+    try:
+        return await create_one(COURSES, course_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/courses/batch', methods=['POST'])
+async def create_courses_batch():
+    try:
+        return await create_batch(COURSES, course_values)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+if __name__ == '__main__':
+    print('Servicio REST (async) escuchando en http://0.0.0.0:5002/api')
+    app.run(host='0.0.0.0', port=5002)
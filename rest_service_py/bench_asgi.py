@@ -0,0 +1,92 @@
+"""
+Comparación de la versión Flask (app.py) contra la asíncrona (asgi_app.py).
+
+Lanza la misma carga de GET concurrentes contra ambos servicios ya en
+ejecución y muestra throughput y latencias (p50/p95/p99) de cada uno.
+
+Uso:
+  python rest_service_py/bench_asgi.py --flask http://localhost:5001 --asgi http://localhost:5002 \
+      --path /api/courses --requests 2000 --concurrency 200
+
+Con `--json` imprime el resultado como JSON para guardarlo y comparar corridas.
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench'))
+from latency import summarize
+
+
+def run_load(base_url, path, total, concurrency):
+    """Ejecutar `total` GET a `base_url + path` con `concurrency` clientes keep-alive."""
+    url = urlparse(base_url)
+    local = threading.local()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one_request(_):
+        nonlocal errors
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status == 200
+        except Exception:
+            conn.close()
+            local.conn = None
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total)))
+    duration = time.perf_counter() - started
+
+    return dict(summarize(latencies, errors, duration), url=base_url + path, concurrency=concurrency,
+                duration_s=round(duration, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Flask vs ASGI del servicio REST')
+    parser.add_argument('--flask', default='http://localhost:5001', help='URL base del servicio Flask')
+    parser.add_argument('--asgi', default='http://localhost:5002', help='URL base del servicio ASGI')
+    parser.add_argument('--path', default='/api/courses?limit=50')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=50, help='peticiones previas no medidas')
+    parser.add_argument('--json', action='store_true', help='imprimir resultados en JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for name, base in (('flask', args.flask), ('asgi', args.asgi)):
+        run_load(base, args.path, args.warmup, min(args.warmup, args.concurrency))
+        results[name] = run_load(base, args.path, args.requests, args.concurrency)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{"":8}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errores":>10}')
+    for name, r in results.items():
+        print(f'{name:8}{r["throughput_rps"]!s:>10}{r["p50_ms"]!s:>10}{r["p95_ms"]!s:>10}'
+              f'{r["p99_ms"]!s:>10}{r["errors"]:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Caché de lectura en proceso para los listados del servicio REST.
+
+Las respuestas ya serializadas se guardan por ruta + query string (más lo
+registrado con `vary_by`, p. ej. el formato negociado), agrupadas por tabla
+(namespace). Los handlers de escritura invalidan el namespace de la
+tabla que modifican.
+
+El almacenamiento está detrás de `CacheBackend`: `MemoryBackend` (LRU con TTL
+y límite en bytes) sirve para un solo proceso; para varios workers basta con
+implementar la misma interfaz sobre un caché compartido y pasarlo a
+`ReadCache(backend)`.
+
+`TableVersions` da los tokens de versión usados para ETag / Last-Modified;
+app.py los agrega a la clave del caché (`vary_by`), así las escrituras de
+otros procesos también dejan sin uso las respuestas guardadas.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, request
+
+from storage import table_version
+
+
+class CacheBackend:
+    """Interfaz mínima que debe cumplir un backend de caché."""
+
+    def get(self, namespace, key):
+        """Devolver el valor guardado o None si no existe o expiró."""
+        raise NotImplementedError
+
+    def set(self, namespace, key, value, ttl):
+        """Guardar `value` = (cuerpo en bytes, cabeceras) durante `ttl` segundos."""
+        raise NotImplementedError
+
+    def invalidate(self, namespace):
+        """Descartar todas las entradas del namespace."""
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """LRU en memoria con expiración por TTL, acotado por el tamaño total en bytes."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (namespace, key) -> (expires_at, size, value)
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, full_key):
+        _, size, _ = self._entries.pop(full_key)
+        self._bytes -= size
+
+    def get(self, namespace, key):
+        full_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(full_key)
+                return None
+            self._entries.move_to_end(full_key)
+            return entry[2]
+
+    def set(self, namespace, key, value, ttl):
+        body, _ = value
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        full_key = (namespace, key)
+        with self._lock:
+            if full_key in self._entries:
+                self._drop(full_key)
+            self._entries[full_key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._evictions += 1
+
+    def invalidate(self, namespace):
+        with self._lock:
+            for full_key in [k for k in self._entries if k[0] == namespace]:
+                self._drop(full_key)
+
+    def stats(self):
+        with self._lock:
+            return dict(entries=len(self._entries), bytes=self._bytes,
+                        max_bytes=self.max_bytes, evictions=self._evictions)
+
+
+class ReadCache:
+    """Caché de respuestas GET con contadores de aciertos y fallos."""
+
+    # Cabeceras de la respuesta original que se conservan en el caché.
+    KEPT_HEADERS = ('Content-Type', 'Vary', 'Link', 'X-Next-Cursor')
+
+    def __init__(self, backend, ttl=30.0, namespaces=None, settle=0.0):
+        self.backend = backend
+        self.ttl = ttl
+        # Segundos tras una invalidación en los que no se guardan respuestas:
+        # con réplicas de lectura podrían venir de una réplica que aún no
+        # tiene la escritura.
+        self.settle = settle
+        self._invalidated_at = {}
+        # None = todos los namespaces habilitados
+        self.namespaces = namespaces
+        self._counts = dict(hits=0, misses=0, invalidations=0)
+        # Generación por namespace: evita guardar una respuesta calculada antes
+        # de una invalidación concurrente.
+        self._generations = {}
+        self._listeners = []
+        self._bypass = []
+        self._vary = []
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def enabled(self, namespace):
+        return self.namespaces is None or namespace in self.namespaces
+
+    def cached(self, namespace):
+        """Decorador para vistas GET: sirve la respuesta del caché si existe."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled(namespace) or any(skip() for skip in self._bypass):
+                    return view(*args, **kwargs)
+                key = ' '.join([request.full_path] + [vary() for vary in self._vary])
+                hit = self.backend.get(namespace, key)
+                if hit is not None:
+                    self._count('hits')
+                    body, headers = hit
+                    return current_app.response_class(body, headers=headers)
+                self._count('misses')
+                generation = self._generations.get(namespace, 0)
+                resp = current_app.make_response(view(*args, **kwargs))
+                settled = time.monotonic() - self._invalidated_at.get(namespace, float('-inf')) >= self.settle
+                if (resp.status_code == 200 and not resp.is_streamed and settled
+                        and self._generations.get(namespace, 0) == generation):
+                    headers = {h: resp.headers[h] for h in self.KEPT_HEADERS if h in resp.headers}
+                    self.backend.set(namespace, key, (resp.get_data(), headers), self.ttl)
+                return resp
+            return wrapper
+        return decorator
+
+    def invalidates(self, *namespaces):
+        """Decorador para vistas de escritura: invalida los namespaces al terminar.
+
+        Se invalida aunque la vista falle, porque una carga por lotes puede
+        haber confirmado algunos bloques antes del error.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    for namespace in namespaces:
+                        self.invalidate(namespace)
+            return wrapper
+        return decorator
+
+    def bypass_if(self, predicate):
+        """Registrar `predicate()`: si es verdadero, la petición no usa el caché."""
+        self._bypass.append(predicate)
+
+    def vary_by(self, key_part):
+        """Registrar `key_part()`: su valor (texto) forma parte de la clave de caché."""
+        self._vary.append(key_part)
+
+    def on_invalidate(self, listener):
+        """Registrar `listener(namespace)`, llamado en cada invalidación."""
+        self._listeners.append(listener)
+
+    def invalidate(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._invalidated_at[namespace] = time.monotonic()
+            self._counts['invalidations'] += 1
+        self.backend.invalidate(namespace)
+        for listener in self._listeners:
+            listener(namespace)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_ratio'] = round(counts['hits'] / lookups, 4) if lookups else None
+        counts.update(self.backend.stats())
+        return counts
+
+
+class TableVersions:
+    """Token de versión por tabla para responder GET condicionales (ETag).
+
+    El token combina `MAX(id)` de la tabla con la versión compartida de
+    `table_versions` (ver `storage.table_version`): sólo estado de la BD, así
+    que cambia con las escrituras de cualquier proceso y todos los workers dan
+    el mismo ETag para los mismos datos. Last-Modified es la fecha de la última
+    escritura; si la tabla sólo se cargó en masa, el momento en que este
+    proceso vio el token por primera vez.
+    """
+
+    def __init__(self):
+        self._seen = {}  # tabla -> (token, datetime)
+        self._lock = threading.Lock()
+
+    def current(self, cur, table):
+        """Devolver (token, last_modified) consultando la BD con el cursor dado."""
+        max_id, version, updated_at = table_version(cur, table)
+        token = f'{table}-{max_id}-{version or 0}'
+        if updated_at is not None:
+            # Las fechas HTTP no tienen fracciones de segundo: If-Modified-Since vuelve truncada.
+            return token, updated_at.replace(microsecond=0, tzinfo=timezone.utc)
+        with self._lock:
+            seen = self._seen.get(table)
+            if seen is None or seen[0] != token:
+                seen = self._seen[table] = (token, datetime.now(timezone.utc).replace(microsecond=0))
+            return seen
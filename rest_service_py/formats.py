@@ -0,0 +1,111 @@
+"""
+Formatos de respuesta de los listados, elegidos por la cabecera `Accept`.
+
+  application/json                   arreglo de objetos (por defecto, como antes)
+  application/vnd.columnar+json      {"columns": [...], "rows": N, "data": [[...], ...]}:
+                                     los nombres una sola vez y un arreglo por columna
+  application/msgpack                arreglo de objetos en MessagePack
+  application/vnd.columnar+msgpack   formato columnar en MessagePack
+
+Los de MessagePack sólo se ofrecen con `msgpack` instalado; sin coincidencia
+se responde JSON (el Content-Type indica qué se envió).
+
+Tipos: DECIMAL viaja como texto ("85.50", exacto, sin pasar por float) en
+todos los formatos. DATETIME va en ISO 8601 ("2024-03-01T10:00:00") en los
+formatos nuevos; application/json conserva lo que devolvía jsonify (fecha
+HTTP) para no romper clientes.
+
+Con `orjson` instalado, `init_app` cambia el codificador de `app.json` (todos
+los jsonify) por orjson, con el mismo resultado salvo que lo no-ASCII va en
+UTF-8 en lugar de escapado. Compartido por app.py y asgi_app.py.
+"""
+import json
+from datetime import date
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+COLUMNAR_JSON = 'application/vnd.columnar+json'
+MSGPACK = 'application/msgpack'
+COLUMNAR_MSGPACK = 'application/vnd.columnar+msgpack'
+# Nombre anterior al registro de application/msgpack; lo envían varios clientes.
+LEGACY_MSGPACK = 'application/x-msgpack'
+
+
+def offered():
+    """Tipos que se pueden negociar, JSON primero (gana ante `*/*`)."""
+    types = [JSON, COLUMNAR_JSON]
+    if msgpack is not None:
+        types += [MSGPACK, COLUMNAR_MSGPACK, LEGACY_MSGPACK]
+    return types
+
+
+def negotiate(accept):
+    """Tipo de respuesta para `accept` (`request.accept_mimetypes`)."""
+    best = accept.best_match(offered(), default=JSON)
+    return MSGPACK if best == LEGACY_MSGPACK else best
+
+
+def columnar(rows, columns):
+    """Filas (dicts en el orden de `columns`, como las da el cursor) a columnas."""
+    if not rows:
+        data = [[] for _ in columns]
+    else:
+        data = [list(values) for values in zip(*(row.values() for row in rows))]
+    return {'columns': list(columns), 'rows': len(rows), 'data': data}
+
+
+def _portable(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} no es serializable')
+
+
+def encode(mimetype, rows, columns):
+    """Cuerpo de la respuesta para un tipo distinto de application/json."""
+    layout = columnar(rows, columns) if mimetype in (COLUMNAR_JSON, COLUMNAR_MSGPACK) else rows
+    if mimetype in (MSGPACK, COLUMNAR_MSGPACK):
+        return msgpack.packb(layout, default=_portable, use_bin_type=True, datetime=False)
+    if mimetype == COLUMNAR_JSON:
+        if orjson is not None:
+            # orjson escribe datetime en ISO 8601 por sí mismo.
+            return orjson.dumps(layout, default=_portable)
+        return json.dumps(layout, default=_portable, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    raise ValueError(f'Unsupported response type {mimetype}')
+
+
+class OrjsonProvider:
+    """Mezcla para el JSONProvider de Flask o Quart: `dumps` con orjson.
+
+    Mantiene la conversión de tipos del proveedor (`self.default`: DECIMAL
+    como texto, fechas HTTP) y el orden de claves. Con opciones que orjson no
+    tiene (`indent` en modo debug) usa el json estándar.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {'separators'}:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+
+def init_app(app):
+    """Usar orjson en `app.json` si está instalado."""
+    if orjson is None:
+        return
+
+    class FastJSONProvider(OrjsonProvider, type(app.json)):
+        pass
+
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,295 @@
+"""
+Escritura diferida de calificaciones con commit agrupado (opt-in).
+
+En los cierres de calificaciones cada `POST /api/grades` hacía su propio
+commit y la BD pasaba el tiempo en fsyncs. Con `GRADES_WRITE_BEHIND=1` el POST
+valida la calificación, la agrega a una cola local durable y responde 202 con
+un ticket; un hilo en segundo plano la inserta después junto con las demás
+pendientes, un INSERT multi-fila y un commit por lote. El lote se confirma al
+juntar `GRADE_QUEUE_BATCH` calificaciones o cada `GRADE_QUEUE_DELAY` segundos.
+
+La cola es un archivo SQLite (`GRADE_QUEUE_PATH`) en modo WAL con
+synchronous=FULL: lo encolado sobrevive a una caída del proceso. Varios
+workers pueden compartir el archivo; sólo el que tiene la concesión (tabla
+`lease`) vacía la cola.
+
+Cada ticket se guarda en `grade_tickets` en la misma transacción que su
+calificación. Si el proceso cae después del commit y antes de marcar el
+ticket en la cola local, el siguiente vaciado lo encuentra ahí y no inserta
+la calificación dos veces.
+"""
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from storage import Grades, utc_offset
+
+QUEUE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS queue (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  ticket TEXT NOT NULL UNIQUE,
+  enrollment_id INTEGER NOT NULL,
+  grade TEXT NOT NULL,
+  queued_at TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued',
+  grade_id INTEGER,
+  error TEXT,
+  done_at TEXT
+);
+CREATE INDEX IF NOT EXISTS queue_status ON queue (status, seq);
+CREATE TABLE IF NOT EXISTS lease (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  owner TEXT,
+  expires REAL NOT NULL
+);
+INSERT OR IGNORE INTO lease (id, owner, expires) VALUES (1, NULL, 0);
+'''
+
+# graded_at es el momento en que se encoló, no el del vaciado. Se encola en
+# UTC y se guarda en la zona de la sesión de la BD, como el CURRENT_TIMESTAMP
+# de los INSERT síncronos.
+QUEUED_GRADES = Grades('grades', ('id', 'enrollment_id', 'grade', 'graded_at'),
+                       ('enrollment_id', 'grade', 'graded_at'))
+TICKET_INSERT = 'INSERT INTO grade_tickets (ticket, grade_id, created_at) VALUES (%s, %s, %s)'
+
+# Errores propios de la fila (FK inexistente, valor fuera de rango): el ticket
+# queda como fallido. Cualquier otro error (BD caída, timeout) deja el lote en
+# la cola para el siguiente intento. Se comparan por nombre porque sqlite3 y
+# mysql-connector definen sus propias clases DB-API.
+ROW_ERRORS = ('IntegrityError', 'DataError')
+
+LEASE_SECONDS = 10.0
+PURGE_EVERY = 3600.0
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class GradeQueue:
+    """Cola durable + hilo que la vacía en lotes hacia `pool`.
+
+    `on_flush()` se llama tras cada lote con calificaciones insertadas (el
+    servicio invalida ahí el caché de grades).
+    """
+
+    def __init__(self, path, pool, batch_size=500, max_delay=0.2, retention_days=7, on_flush=None):
+        self.path = path
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.retention = timedelta(days=retention_days)
+        self.on_flush = on_flush
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._appended = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._owner = None
+        self._last_purge = 0.0
+        self._stats = dict(queued=0, flushed=0, failed=0, batches=0, errors=0)
+        self._db().executescript(QUEUE_SCHEMA)
+
+    def _db(self):
+        """Conexión a la cola propia del hilo (y del proceso)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def ensure_started(self):
+        """Arrancar el hilo de vaciado en este proceso (después del fork de serve.py)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._owner = f'{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}'
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='grade-queue-flusher', daemon=True)
+            self._thread.start()
+
+    # --- Peticiones --------------------------------------------------------------
+
+    def append(self, enrollment_id, grade):
+        """Encolar una calificación validada; devuelve el ticket."""
+        ticket = uuid.uuid4().hex
+        self._db().execute(
+            'INSERT INTO queue (ticket, enrollment_id, grade, queued_at) VALUES (?, ?, ?, ?)',
+            (ticket, enrollment_id, str(grade), _utcnow().isoformat(sep=' ')))
+        with self._lock:
+            self._stats['queued'] += 1
+            self._appended += 1
+            if self._appended >= self.batch_size:
+                self._appended = 0
+                self._wake.set()
+        return ticket
+
+    def status(self, ticket):
+        """Estado de un ticket: queued, persisted o failed; None si no está en la cola local."""
+        row = self._db().execute(
+            'SELECT status, grade_id, error, queued_at, done_at FROM queue WHERE ticket = ?', (ticket,)).fetchone()
+        if row is None:
+            return None
+        status, grade_id, error, queued_at, done_at = row
+        return {'ticket': ticket, 'status': status, 'grade_id': grade_id, 'error': error,
+                'queued_at': queued_at, 'done_at': done_at}
+
+    def persisted_ticket(self, conn, ticket):
+        """grade_id de un ticket ya guardado en la BD (la cola local pudo purgarlo)."""
+        cur = conn.cursor()
+        cur.execute('SELECT grade_id FROM grade_tickets WHERE ticket = %s', (ticket,))
+        row = cur.fetchone()
+        cur.close()
+        return row[0] if row else None
+
+    def stats(self):
+        pending = self._db().execute("SELECT COUNT(*) FROM queue WHERE status = 'queued'").fetchone()[0]
+        with self._lock:
+            return dict(self._stats, pending=pending, leader=self._has_lease)
+
+    # --- Vaciado -----------------------------------------------------------------
+
+    _has_lease = False
+
+    def _acquire_lease(self):
+        now = time.time()
+        cur = self._db().execute(
+            'UPDATE lease SET owner = ?, expires = ? WHERE id = 1 AND (owner = ? OR expires < ?)',
+            (self._owner, now + LEASE_SECONDS, self._owner, now))
+        self._has_lease = cur.rowcount == 1
+        return self._has_lease
+
+    def _release_lease(self):
+        self._db().execute('UPDATE lease SET expires = 0 WHERE id = 1 AND owner = ?', (self._owner,))
+        self._has_lease = False
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.max_delay)
+            self._wake.clear()
+            try:
+                if self._acquire_lease():
+                    self.flush()
+                    self._purge()
+            except Exception as e:
+                # BD caída u otro error transitorio: lo pendiente sigue en la cola.
+                with self._lock:
+                    self._stats['errors'] += 1
+                print(f'grade_queue: error al vaciar la cola: {e}', file=sys.stderr)
+                self._stop.wait(min(5.0, self.max_delay * 10))
+
+    def flush(self):
+        """Insertar todo lo pendiente en lotes de batch_size; devuelve los tickets procesados.
+
+        La concesión se renueva antes de cada lote. Si se perdió (el proceso
+        estuvo detenido más de LEASE_SECONDS y otro worker la tomó), se deja de
+        vaciar: lo que falta lo inserta el nuevo dueño.
+        """
+        done = 0
+        while True:
+            if not self._acquire_lease():
+                print('grade_queue: se perdió la concesión; otro worker vacía la cola', file=sys.stderr)
+                return done
+            rows = self._db().execute(
+                "SELECT ticket, enrollment_id, grade, queued_at FROM queue WHERE status = 'queued' "
+                'ORDER BY seq LIMIT ?', (self.batch_size,)).fetchall()
+            if not rows:
+                return done
+            self._flush_batch(rows)
+            done += len(rows)
+            if len(rows) < self.batch_size:
+                return done
+
+    def _flush_batch(self, rows):
+        tickets = [r[0] for r in rows]
+        with self.pool.connection() as conn:
+            results = self._already_persisted(conn, tickets)
+            offset = utc_offset(conn)
+            pending = [(ticket, (eid, Decimal(grade), datetime.fromisoformat(queued_at) + offset))
+                       for ticket, eid, grade, queued_at in rows if ticket not in results]
+
+            def record_tickets(conn, ids):
+                now = _utcnow()
+                cur = conn.cursor()
+                cur.executemany(TICKET_INSERT, [(t, gid, now) for t, gid in ids.items()])
+                cur.close()
+
+            inserted = QUEUED_GRADES.insert_many(conn, pending, chunk_size=len(pending) or 1,
+                                                 before_commit=record_tickets)
+        transient = [r for r in inserted.values()
+                     if isinstance(r, Exception) and type(r).__name__ not in ROW_ERRORS]
+        if transient:
+            # Las filas que sí entraron ya tienen su ticket en la BD: el reintento las salta.
+            raise transient[0]
+        results.update(inserted)
+        self._mark(results)
+        if self.on_flush and any(not isinstance(r, Exception) for r in inserted.values()):
+            self.on_flush()
+
+    def _already_persisted(self, conn, tickets):
+        placeholders = ', '.join(['%s'] * len(tickets))
+        cur = conn.cursor()
+        cur.execute(f'SELECT ticket, grade_id FROM grade_tickets WHERE ticket IN ({placeholders})', tuple(tickets))
+        found = dict(cur.fetchall())
+        cur.close()
+        return found
+
+    def _mark(self, results):
+        done_at = _utcnow().isoformat(sep=' ')
+        updates = []
+        failed = 0
+        for ticket, outcome in results.items():
+            if isinstance(outcome, Exception):
+                failed += 1
+                updates.append(('failed', None, str(outcome), done_at, ticket))
+            else:
+                updates.append(('persisted', outcome, None, done_at, ticket))
+        db = self._db()
+        db.execute('BEGIN')
+        db.executemany('UPDATE queue SET status = ?, grade_id = ?, error = ?, done_at = ? WHERE ticket = ?', updates)
+        db.execute('COMMIT')
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['flushed'] += len(results) - failed
+            self._stats['failed'] += failed
+
+    def _purge(self):
+        """Borrar tickets terminados más viejos que la retención (local y en la BD)."""
+        if time.monotonic() - self._last_purge < PURGE_EVERY:
+            return
+        self._last_purge = time.monotonic()
+        cutoff = _utcnow() - self.retention
+        self._db().execute("DELETE FROM queue WHERE status != 'queued' AND done_at < ?",
+                           (cutoff.isoformat(sep=' '),))
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute('DELETE FROM grade_tickets WHERE created_at < %s', (cutoff,))
+            conn.commit()
+            cur.close()
+
+    def close(self, timeout=5.0):
+        """Detener el hilo con un último vaciado si este proceso tiene la concesión."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        try:
+            if self._acquire_lease():
+                self.flush()
+                self._release_lease()
+        except Exception as e:
+            print(f'grade_queue: quedan calificaciones en la cola: {e}', file=sys.stderr)
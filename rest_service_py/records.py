@@ -0,0 +1,54 @@
+"""
+Validación de los recursos del servicio REST.
+
+Compartido por la versión Flask (app.py) y la asíncrona (asgi_app.py) para que
+ambas acepten y devuelvan exactamente lo mismo. Las entidades (columnas,
+filtros de los listados, inserciones) vienen de `storage`.
+"""
+from decimal import Decimal, InvalidOperation
+
+
+def grade_values(data):
+    """Validar el cuerpo de una calificación y devolver los valores a insertar.
+
+    Verifica tipos y rango (0-100) como `import_grades.parse_grade`: un valor
+    inválido es un error del elemento (400), no un fallo de la BD al insertar
+    o al actualizar las tablas de resumen.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    enrollment_id = data.get('enrollment_id')
+    grade = data.get('grade')
+    if not enrollment_id or grade is None:
+        raise ValueError('Missing enrollment_id or grade')
+    try:
+        enrollment_id = int(enrollment_id)
+        grade = Decimal(str(grade)).quantize(Decimal('0.01'))
+    except (TypeError, ValueError, InvalidOperation):
+        raise ValueError('enrollment_id must be an integer and grade a number')
+    if enrollment_id < 1 or not grade.is_finite() or not Decimal(0) <= grade <= Decimal(100):
+        raise ValueError('grade must be between 0 and 100')
+    return (enrollment_id, grade)
+
+
+def student_values(data):
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    student_number = data.get('student_number')
+    first_name = data.get('first_name')
+    last_name = data.get('last_name')
+    email = data.get('email')
+    if not student_number or not first_name or not last_name:
+        raise ValueError('Missing required fields')
+    return (student_number, first_name, last_name, email)
+
+
+def course_values(data):
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    code = data.get('code')
+    name = data.get('name')
+    credits = data.get('credits', 3)
+    if not code or not name:
+        raise ValueError('Missing code or name')
+    return (code, name, credits)
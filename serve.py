@@ -0,0 +1,166 @@
+"""
+Arranque de producción de los servicios con varios procesos (gunicorn).
+
+`python rest_service_py/app.py` y `python soap_service/app.py` usan el
+servidor de desarrollo de Flask: un solo proceso. Este script sirve la misma
+app con un proceso maestro y `--workers` procesos (pre-fork), cada uno con
+`--threads` hilos, así se aprovechan todos los núcleos.
+
+  - `--preload`: importa la app una vez en el maestro antes de hacer fork
+    (arranque más rápido y memoria compartida). Los pools de conexiones se
+    vacían solos en cada worker después del fork (`db_pool.ConnectionPool`),
+    así ningún worker usa una conexión abierta por otro proceso.
+  - `--max-requests N`: cada worker se recicla tras N peticiones (más un
+    desfase aleatorio de hasta `--max-requests-jitter`) para acotar fugas de
+    memoria; el maestro lo reemplaza sin cortar peticiones.
+  - Señales al maestro: SIGHUP levanta workers nuevos y retira los viejos
+    cuando terminan sus peticiones en curso (sin `--preload` recargan el
+    código); SIGTERM deja de aceptar conexiones, espera hasta
+    `--graceful-timeout` segundos a que terminen las peticiones y sale.
+
+Requiere gunicorn (sólo Linux/macOS; en Windows usar el servidor de desarrollo).
+
+Uso:
+  python serve.py rest --workers 4 --threads 8 --preload --max-requests 10000
+  python serve.py soap --bind 0.0.0.0:5000
+"""
+import argparse
+import importlib.util
+import itertools
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# servicio -> (archivo de la app, puerto por defecto)
+SERVICES = {
+    'rest': (os.path.join(ROOT, 'rest_service_py', 'app.py'), 5001),
+    'soap': (os.path.join(ROOT, 'soap_service', 'app.py'), 5000),
+}
+
+
+def load_service(name):
+    """Importar la app Flask del servicio igual que al ejecutarla como script."""
+    path = SERVICES[name][0]
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(f'{name}_service_app', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def recycling_thread_worker():
+    """Clase de worker gthread que se recicla sin cortar conexiones aceptadas.
+
+    El gthread de gunicorn, al llegar a max_requests, sale y cierra las
+    conexiones que ya aceptó pero cuya petición aún no empezó a leer (el
+    cliente recibe una respuesta vacía). Esta variante deja de aceptar, atiende
+    lo pendiente, cierra las keep-alive ociosas y recién entonces sale
+    (o al pasar graceful_timeout).
+    """
+    from gunicorn.workers.gthread import ThreadWorker
+
+    class RecyclingThreadWorker(ThreadWorker):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # El conteo propio reemplaza al de gunicorn, que apagaría el worker de golpe.
+            self.recycle_after, self.max_requests = self.max_requests, sys.maxsize
+            self.served = itertools.count(1)
+            self.draining_since = None
+
+        def handle_request(self, req, conn):
+            result = super().handle_request(req, conn)
+            if next(self.served) >= self.recycle_after and self.draining_since is None:
+                self.draining_since = time.monotonic()
+            return result
+
+        def murder_keepalived(self):
+            # Se llama en cada vuelta del ciclo principal del worker.
+            if self.draining_since is not None and self.alive:
+                self.drain()
+            super().murder_keepalived()
+
+        def drain(self):
+            if not getattr(self, 'stopped_accepting', False):
+                self.log.info('Reciclando worker tras %s peticiones', self.recycle_after)
+                for sock in self.sockets:
+                    self.poller.unregister(sock)
+                self.stopped_accepting = True
+            with self._lock:
+                for idle in self._keep:
+                    idle.timeout = 0
+            expired = time.monotonic() - self.draining_since > self.cfg.graceful_timeout
+            if expired or (self.nr_conns == 0 and not self.futures):
+                self.alive = False
+
+    return RecyclingThreadWorker
+
+
+def gunicorn_options(args):
+    """Opciones de gunicorn a partir de los argumentos de la CLI."""
+    return {
+        'bind': args.bind or f'0.0.0.0:{SERVICES[args.service][1]}',
+        'workers': args.workers,
+        'threads': args.threads,
+        # gthread: un hilo de control por worker atiende el latido y acepta
+        # conexiones; las peticiones largas (exportaciones) no lo bloquean.
+        'worker_class': recycling_thread_worker() if args.threads > 1 else 'sync',
+        'preload_app': args.preload,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter,
+        'graceful_timeout': args.graceful_timeout,
+        'timeout': args.timeout,
+        'keepalive': 5,
+        'accesslog': '-' if args.access_log else None,
+        'proc_name': f'uav-{args.service}',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servir REST o SOAP con varios procesos')
+    parser.add_argument('service', choices=sorted(SERVICES))
+    parser.add_argument('--bind', help='host:puerto (por defecto 0.0.0.0 y el puerto del servicio)')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVE_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('SERVE_THREADS', 4)),
+                        help='hilos por worker; conviene que no pase de DB_POOL_SIZE')
+    parser.add_argument('--preload', action='store_true', default=os.environ.get('SERVE_PRELOAD') == '1',
+                        help='cargar la app en el maestro antes del fork')
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('SERVE_MAX_REQUESTS', 0)),
+                        help='reciclar cada worker tras N peticiones (0 = nunca)')
+    parser.add_argument('--max-requests-jitter', type=int, default=None,
+                        help='desfase aleatorio para no reciclar todos a la vez (por defecto 10%%)')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='segundos para terminar las peticiones en curso al recargar o detener')
+    parser.add_argument('--timeout', type=int, default=60, help='segundos sin latido antes de reiniciar un worker')
+    parser.add_argument('--access-log', action='store_true', help='registrar cada petición en stdout')
+    args = parser.parse_args()
+    if args.max_requests_jitter is None:
+        args.max_requests_jitter = args.max_requests // 10
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print('Error: gunicorn no está instalado (pip install gunicorn; no funciona en Windows). '
+              f'En desarrollo usar: python {os.path.relpath(SERVICES[args.service][0])}')
+        sys.exit(2)
+
+    class ServiceApplication(BaseApplication):
+        def __init__(self, service, options):
+            self.service = service
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return load_service(self.service)
+
+    ServiceApplication(args.service, gunicorn_options(args)).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,18 @@
+import itertools
 import os
-import re
-import mysql.connector
-from flask import Flask, request, Response
+import sys
+import tempfile
+from contextlib import contextmanager
+from functools import partial
+from flask import Flask, g, jsonify, request, Response
 from lxml import etree
 
-
-def parse_mysql_url(url):
-    m = re.match(r'mysql://([^:]+):([^@]+)@([^:]+):(\d+)/(\w+)', url)
-    if not m:
-        raise ValueError('DATABASE_URL no válido')
-    return dict(user=m.group(1), password=m.group(2), host=m.group(3), port=int(m.group(4)), database=m.group(5))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import ENROLLMENTS
+from replicas import create_routing_pool, init_app as init_replicas, mark_write, primary_reads
+from metrics import MetricsRegistry, QueryTimer, init_app as init_metrics
+from dispatch import (OPERATIONS, ParserCache, Validator, build_wsdl, complex_type, local_name,
+                      operation, read_operation)
 
 
 app = Flask(__name__)
@@ -17,12 +20,50 @@ app = Flask(__name__)
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if not DATABASE_URL:
     raise RuntimeError('Setear variable de entorno DATABASE_URL')
-DB_CONFIG = parse_mysql_url(DATABASE_URL)
-DB_CONFIG['charset'] = 'utf8'
+# Escrituras al primario; GetEnrollments* a las réplicas de DB_REPLICA_URLS, si hay.
+db_pool = create_routing_pool(DATABASE_URL)
+
+metrics_registry = MetricsRegistry()
+db_pool.instrument = QueryTimer(metrics_registry)
+metrics_registry.add_gauges('db_pool', 'Estado del pool de conexiones', db_pool.stats)
+metrics_registry.add_gauges('db_routing', 'Lecturas por destino y réplicas utilizables', db_pool.replica_stats)
+init_metrics(app, metrics_registry)
+init_replicas(app, db_pool)
+
+# En producción se omite la indentación del XML (menos bytes y CPU).
+PRETTY_PRINT = os.environ.get('SOAP_PRETTY_PRINT', '0') == '1'
+# Filas leídas del cursor por cada bloque de respuesta enviado.
+STREAM_CHUNK_SIZE = 500
+# Matrículas por transacción en CreateEnrollments.
+INGEST_CHUNK_SIZE = int(os.environ.get('SOAP_INGEST_CHUNK_SIZE', 1000))
+# Bytes de resultados de CreateEnrollments que se guardan en memoria antes de pasar a disco.
+RESULTS_SPOOL_SIZE = int(os.environ.get('SOAP_RESULTS_SPOOL_SIZE', 4 << 20))
+# Cantidad de student_id por consulta IN (...) en GetEnrollmentsBatch.
+BATCH_QUERY_SIZE = int(os.environ.get('SOAP_BATCH_QUERY_SIZE', 500))
+# Máximo de student_id aceptados en una sola petición GetEnrollmentsBatch.
+MAX_BATCH_STUDENTS = int(os.environ.get('SOAP_MAX_BATCH_STUDENTS', 5000))
 
 
 def get_db():
-    return mysql.connector.connect(**DB_CONFIG)
+    """Conexión al primario asociada a la petición actual (para escribir)."""
+    mark_write()
+    conn = g.get('db')
+    if conn is None or not conn.checked_out:
+        conn = g.db = db_pool.acquire()
+    return conn
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    # Devuelve la conexión al pool aunque el handler haya fallado antes de cerrarla.
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.close()
+
+
+@app.route('/pool/stats', methods=['GET'])
+def pool_stats():
+    return jsonify(dict(db_pool.stats(), routing=db_pool.routing_status()))
 
 
 def build_soap_response(content_xml):
@@ -33,84 +74,336 @@ def build_soap_response(content_xml):
     )
     body = etree.SubElement(root, '{http://schemas.xmlsoap.org/soap/envelope/}Body')
     body.append(content_xml)
-    return etree.tostring(root, encoding='UTF-8', xml_declaration=True, pretty_print=True)
+    return etree.tostring(root, encoding='UTF-8', xml_declaration=True, pretty_print=PRETTY_PRINT)
+
+
+class _ChunkBuffer:
+    """Destino de `etree.xmlfile` que acumula bytes hasta que se vacían."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(data)
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+@contextmanager
+def soap_body(xf):
+    """Abrir en `xf` la declaración, el Envelope y el Body; el contenido va dentro."""
+    xf.write_declaration()
+    with xf.element('{http://schemas.xmlsoap.org/soap/envelope/}Envelope',
+                    nsmap={'soap': 'http://schemas.xmlsoap.org/soap/envelope/'}):
+        with xf.element('{http://schemas.xmlsoap.org/soap/envelope/}Body'):
+            yield
+
+
+def stream_soap_response(write_content):
+    """Respuesta SOAP serializada de forma incremental con `etree.xmlfile`.
+
+    `write_content(xf)` es un generador que escribe el contenido del Body en
+    `xf` y hace `yield` cada vez que hay un bloque listo para enviar. El primer
+    bloque se genera antes de devolver la respuesta, así los errores de la
+    consulta siguen respondiéndose con 500 en vez de cortar un 200 a medias.
+    """
+    def generate():
+        out = _ChunkBuffer()
+        with etree.xmlfile(out, encoding='UTF-8') as xf:
+            with soap_body(xf):
+                for _ in write_content(xf):
+                    xf.flush()
+                    yield out.drain()
+        yield out.drain()
+
+    chunks = generate()
+    first = next(chunks)
+    return Response(itertools.chain([first], chunks), mimetype='text/xml')
+
+
+def spooled_soap_response(write_content, block_size=1 << 16):
+    """Respuesta SOAP escrita completa antes de enviar el primer byte.
+
+    `write_content(xf)` escribe el contenido del Body; el documento se guarda
+    en un archivo temporal (en memoria hasta RESULTS_SPOOL_SIZE bytes) y se
+    envía por bloques.
+    """
+    spool = tempfile.SpooledTemporaryFile(RESULTS_SPOOL_SIZE)
+    try:
+        with etree.xmlfile(spool, encoding='UTF-8') as xf:
+            with soap_body(xf):
+                write_content(xf)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+
+    def send():
+        with spool:
+            yield from iter(partial(spool.read, block_size), b'')
+    return Response(send(), mimetype='text/xml')
+
+
+def enrollment_element(row):
+    e = etree.Element('enrollment')
+    etree.SubElement(e, 'id').text = str(row['id'])
+    etree.SubElement(e, 'student_id').text = str(row['student_id'])
+    etree.SubElement(e, 'course_id').text = str(row['course_id'])
+    etree.SubElement(e, 'status').text = str(row['status'])
+    return e
+
+
+def write_enrollments(student_id):
+    """Escritor de GetEnrollmentsResponse que lee el cursor por bloques.
+
+    Usa su propia conexión de lectura (réplica) porque la respuesta se sigue
+    generando después del teardown de la petición.
+    """
+    primary = primary_reads()
+
+    def write(xf):
+        with db_pool.read_connection(primary) as conn:
+            chunks = ENROLLMENTS.stream_by_student(conn, student_id, STREAM_CHUNK_SIZE)
+            # El generador no consulta hasta pedirle el primer bloque: se pide antes
+            # del primer yield para que un error de la consulta siga siendo un 500.
+            first = next(chunks, [])
+            with xf.element('GetEnrollmentsResponse'):
+                yield
+                for rows in itertools.chain([first], chunks):
+                    for row in rows:
+                        xf.write(enrollment_element(row), pretty_print=PRETTY_PRINT)
+                    yield
+    return write
+
+
+def write_enrollments_batch(student_ids):
+    """Escritor de GetEnrollmentsBatchResponse.
+
+    Resuelve los ids en consultas `IN (...)` de BATCH_QUERY_SIZE elementos
+    sobre una sola conexión, en vez de una consulta por estudiante, y envía
+    cada bloque de estudiantes en cuanto se lee.
+    """
+    primary = primary_reads()
+
+    def write(xf):
+        with db_pool.read_connection(primary) as conn:
+            with xf.element('GetEnrollmentsBatchResponse'):
+                for start in range(0, len(student_ids), BATCH_QUERY_SIZE):
+                    chunk = student_ids[start:start + BATCH_QUERY_SIZE]
+                    grouped = ENROLLMENTS.by_students(conn, chunk)
+                    for sid in chunk:
+                        with xf.element('student'):
+                            with xf.element('student_id'):
+                                xf.write(str(sid))
+                            for row in grouped[sid]:
+                                xf.write(enrollment_element(row), pretty_print=PRETTY_PRINT)
+                    yield
+    return write
+
+
+def enrollment_values(elem):
+    student_id = STUDENT_ID(elem)
+    course_id = COURSE_ID(elem)
+    status = STATUS(elem) or 'enrolled'
+    if not student_id or not course_id:
+        raise ValueError('Missing student_id or course_id')
+    return (int(student_id), int(course_id), status)
+
+
+def write_create_enrollments(events, op_elem):
+    """Escritor de CreateEnrollmentsResponse para envelopes de cualquier tamaño.
+
+    Cada <enrollment> se valida al cerrarse y se elimina del árbol, y se
+    insertan por bloques de INGEST_CHUNK_SIZE, así la memoria no depende del
+    tamaño del envelope. Los resultados se escriben a medida que se confirma
+    cada bloque, pero no se envían hasta leer la petición completa (ver
+    `spooled_soap_response`): si el cliente no lee la respuesta mientras sigue
+    enviando, o el servidor no lee la petición mientras escribe la respuesta,
+    ambos quedarían esperándose. Cualquier error corta la lectura con un
+    <error> y los totales, así el documento queda siempre completo.
+    """
+    def write_results(xf, results):
+        for index in sorted(results):
+            outcome = results[index]
+            with xf.element('result'):
+                with xf.element('index'):
+                    xf.write(str(index))
+                tag = 'error' if isinstance(outcome, Exception) else 'id'
+                with xf.element(tag):
+                    xf.write(str(outcome))
+
+    def write(xf):
+        processed = failed = 0
+        with xf.element('CreateEnrollmentsResponse'):
+            index = 0
+            rows, results = [], {}
+            try:
+                with db_pool.connection() as conn:
+                    for event, elem in events:
+                        if event != 'end':
+                            continue
+                        if elem is op_elem:
+                            break
+                        if elem.tag != 'enrollment' or elem.getparent() is not op_elem:
+                            continue
+                        try:
+                            error = validator.check(elem) if validator else None
+                            if error:
+                                raise ValueError(error)
+                            rows.append((index, enrollment_values(elem)))
+                        except ValueError as e:
+                            results[index] = e
+                        index += 1
+                        elem.clear()
+                        while elem.getprevious() is not None:
+                            del op_elem[0]
+                        if len(rows) + len(results) >= INGEST_CHUNK_SIZE:
+                            results.update(ENROLLMENTS.insert_many(conn, rows, INGEST_CHUNK_SIZE))
+                            write_results(xf, results)
+                            failed += sum(1 for r in results.values() if isinstance(r, Exception))
+                            processed += len(results)
+                            rows, results = [], {}
+                    results.update(ENROLLMENTS.insert_many(conn, rows, INGEST_CHUNK_SIZE))
+                    write_results(xf, results)
+                    failed += sum(1 for r in results.values() if isinstance(r, Exception))
+                    processed += len(results)
+                # Leer el resto del envelope antes de responder.
+                for _ in events:
+                    pass
+            except etree.XMLSyntaxError as e:
+                # Los bloques anteriores ya quedaron confirmados; el resto se descarta.
+                with xf.element('error'):
+                    xf.write(f'Invalid XML after record {index}: {e}')
+            except Exception as e:
+                # BD caída a mitad: desde el registro `processed` no se guardó nada.
+                with xf.element('error'):
+                    xf.write(f'Stopped at record {processed}: {e}')
+            with xf.element('created'):
+                xf.write(str(processed - failed))
+            with xf.element('failed'):
+                xf.write(str(failed))
+    return write
+
+
+def bad_request(message):
+    return Response(message, status=400, mimetype='text/plain')
+
+
+# --- Operaciones -----------------------------------------------------------------
+# Cada handler recibe el elemento de la operación (o los eventos, si es de
+# streaming) y devuelve la respuesta; el WSDL se genera de estas declaraciones.
+
+ENROLLMENT = complex_type('Enrollment', [
+    ('id', 'xsd:int', 1, 1), ('student_id', 'xsd:int', 1, 1),
+    ('course_id', 'xsd:int', 1, 1), ('status', 'xsd:string', 1, 1)])
+ENROLLMENT_INPUT = complex_type('EnrollmentInput', [
+    ('student_id', 'xsd:int', 1, 1), ('course_id', 'xsd:int', 1, 1), ('status', 'xsd:string', 0, 1)])
+STUDENT_ENROLLMENTS = complex_type('StudentEnrollments', [
+    ('student_id', 'xsd:int', 1, 1), ('enrollment', ENROLLMENT, 0, 'unbounded')])
+CREATE_RESULT = complex_type('CreateResult', [
+    ('index', 'xsd:int', 1, 1), ('id', 'xsd:int', 0, 1), ('error', 'xsd:string', 0, 1)])
+
+# XPath compiladas una vez; buscan sólo hijos directos de la operación.
+STUDENT_ID = etree.XPath('string(student_id)', smart_strings=False)
+COURSE_ID = etree.XPath('string(course_id)', smart_strings=False)
+STATUS = etree.XPath('string(status)', smart_strings=False)
+STUDENT_IDS = etree.XPath('student_id/text()', smart_strings=False)
+
+
+@operation('GetEnrollments',
+           request=[('student_id', 'xsd:int', 1, 1)],
+           response=[('enrollment', ENROLLMENT, 0, 'unbounded')])
+def get_enrollments(op_elem):
+    student_id = STUDENT_ID(op_elem)
+    if not student_id:
+        return bad_request('Missing student_id')
+    return stream_soap_response(write_enrollments(int(student_id)))
+
+
+@operation('GetEnrollmentsBatch',
+           request=[('student_id', 'xsd:int', 1, 'unbounded')],
+           response=[('student', STUDENT_ENROLLMENTS, 0, 'unbounded')])
+def get_enrollments_batch(op_elem):
+    # dict.fromkeys elimina duplicados conservando el orden de la petición
+    student_ids = list(dict.fromkeys(int(v) for v in STUDENT_IDS(op_elem)))
+    if not student_ids:
+        return bad_request('Missing student_id')
+    if len(student_ids) > MAX_BATCH_STUDENTS:
+        return bad_request(f'Too many student_id (max {MAX_BATCH_STUDENTS})')
+    return stream_soap_response(write_enrollments_batch(student_ids))
+
+
+@operation('CreateEnrollment',
+           request=[('student_id', 'xsd:int', 1, 1), ('course_id', 'xsd:int', 1, 1),
+                    ('status', 'xsd:string', 0, 1)],
+           response=[('id', 'xsd:int', 1, 1)])
+def create_enrollment(op_elem):
+    try:
+        values = enrollment_values(op_elem)
+    except ValueError as e:
+        return bad_request(str(e))
+
+    conn = get_db()
+    new_id = ENROLLMENTS.insert(conn, values)
+    conn.close()
+
+    resp_elem = etree.Element('CreateEnrollmentResponse')
+    etree.SubElement(resp_elem, 'id').text = str(new_id)
+    return Response(build_soap_response(resp_elem), mimetype='text/xml')
+
+
+@operation('CreateEnrollments',
+           request=[('enrollment', ENROLLMENT_INPUT, 0, 'unbounded')],
+           response=[('result', CREATE_RESULT, 0, 'unbounded'), ('error', 'xsd:string', 0, 1),
+                     ('created', 'xsd:int', 1, 1), ('failed', 'xsd:int', 1, 1)],
+           streaming=True, item=('enrollment', ENROLLMENT_INPUT))
+def create_enrollments(events, op_elem):
+    # Operación masiva: los <enrollment> se consumen a medida que llegan.
+    mark_write()
+    return spooled_soap_response(write_create_enrollments(events, op_elem))
+
+
+parsers = ParserCache()
+# SOAP_VALIDATE=1 valida cada petición contra el XSD generado (más CPU, errores más claros).
+validator = Validator() if os.environ.get('SOAP_VALIDATE', '0') == '1' else None
+WSDL = build_wsdl(os.environ.get('SOAP_ADDRESS', 'http://localhost:5000/soap'))
 
 
 @app.route('/soap', methods=['POST', 'GET'])
 def soap_endpoint():
     if request.method == 'GET':
-        wsdl = """<?xml version="1.0" encoding="UTF-8"?>
-<definitions xmlns="http://schemas.xmlsoap.org/wsdl/" name="EnrollmentService">
-  <message name="GetEnrollmentsRequest">
-    <part name="student_id" type="xsd:int"/>
-  </message>
-</definitions>"""
-        return Response(wsdl, mimetype='text/xml')
+        return Response(WSDL, mimetype='text/xml')
 
     try:
-        body = request.get_data(as_text=True)
-        root = etree.fromstring(body.encode('utf-8'))
-        
-        body_elem = root.find('.//{http://schemas.xmlsoap.org/soap/envelope/}Body')
-        if body_elem is None:
-            return Response('Invalid SOAP', status=400, mimetype='text/plain')
-        
-        op_elem = body_elem[0]
-        op_name = op_elem.tag.split('}')[-1] if '}' in op_elem.tag else op_elem.tag
-        
-        if op_name == 'GetEnrollments':
-            student_id_elem = op_elem.find('.//student_id')
-            if student_id_elem is None:
-                return Response('Missing student_id', status=400, mimetype='text/plain')
-            student_id = int(student_id_elem.text)
-            
-            conn = get_db()
-            cur = conn.cursor(dictionary=True)
-            cur.execute('SELECT id, student_id, course_id, status FROM enrollments WHERE student_id = %s', (student_id,))
-            rows = cur.fetchall()
-            cur.close()
-            conn.close()
-            
-            resp_elem = etree.Element('GetEnrollmentsResponse')
-            for row in rows:
-                e = etree.SubElement(resp_elem, 'enrollment')
-                etree.SubElement(e, 'id').text = str(row['id'])
-                etree.SubElement(e, 'student_id').text = str(row['student_id'])
-                etree.SubElement(e, 'course_id').text = str(row['course_id'])
-                etree.SubElement(e, 'status').text = str(row['status'])
-            
-            soap_resp = build_soap_response(resp_elem)
-            return Response(soap_resp, mimetype='text/xml')
-        
-        elif op_name == 'CreateEnrollment':
-            student_id_elem = op_elem.find('.//student_id')
-            course_id_elem = op_elem.find('.//course_id')
-            status_elem = op_elem.find('.//status')
-            
-            student_id = int(student_id_elem.text) if student_id_elem is not None else None
-            course_id = int(course_id_elem.text) if course_id_elem is not None else None
-            status = status_elem.text if status_elem is not None else 'enrolled'
-            
-            if not student_id or not course_id:
-                return Response('Missing student_id or course_id', status=400, mimetype='text/plain')
-            
-            conn = get_db()
-            cur = conn.cursor()
-            cur.execute('INSERT INTO enrollments (student_id, course_id, status) VALUES (%s,%s,%s)', 
-                       (student_id, course_id, status))
-            conn.commit()
-            new_id = cur.lastrowid
-            cur.close()
-            conn.close()
-            
-            resp_elem = etree.Element('CreateEnrollmentResponse')
-            etree.SubElement(resp_elem, 'id').text = str(new_id)
-            soap_resp = build_soap_response(resp_elem)
-            return Response(soap_resp, mimetype='text/xml')
-        
-        else:
-            return Response(f'Operation {op_name} not supported', status=400, mimetype='text/plain')
-    
+        # Se parsea el cuerpo directamente desde el stream de la petición, sin
+        # cargarlo completo en memoria.
+        events = parsers.iterparse(request.stream)
+        op_elem = read_operation(events)
+        if op_elem is None:
+            return bad_request('Invalid SOAP')
+
+        op_name = local_name(op_elem.tag)
+        g.metrics_operation = op_name
+        op = OPERATIONS.get(op_name)
+        if op is None:
+            return bad_request(f'Operation {op_name} not supported')
+        if op.streaming:
+            return op.handler(events, op_elem)
+
+        # El resto de operaciones son pequeñas: se lee el documento completo.
+        for _ in events:
+            pass
+        if validator:
+            error = validator.check(op_elem)
+            if error:
+                return bad_request(f'Invalid {op_name}: {error}')
+        return op.handler(op_elem)
+
+    except etree.XMLSyntaxError as e:
+        return bad_request(f'Invalid XML: {e}')
     except Exception as e:
         return Response(f'Error: {str(e)}', status=500, mimetype='text/plain')
 
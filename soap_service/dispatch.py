@@ -0,0 +1,248 @@
+"""
+Registro de operaciones SOAP, parser reutilizable y WSDL/XSD generados.
+
+Cada operación se registra con `@operation(...)` junto con la descripción de
+su petición y su respuesta; el endpoint despacha por nombre con un diccionario
+y el WSDL y el XSD se construyen una sola vez a partir del registro. Agregar
+una operación no requiere tocar el despacho.
+
+Los campos se describen como tuplas `(nombre, tipo, minOccurs, maxOccurs)`;
+el tipo es `xsd:int`/`xsd:string` o el nombre de un tipo de `complex_type`
+(`maxOccurs` puede ser 'unbounded'). Los elementos de las operaciones no
+llevan namespace, igual que hasta ahora.
+"""
+import threading
+
+from lxml import etree
+
+SOAP_ENV_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
+SOAP_BODY = f'{{{SOAP_ENV_NS}}}Body'
+WSDL_NS = 'http://schemas.xmlsoap.org/wsdl/'
+WSDL_SOAP_NS = 'http://schemas.xmlsoap.org/wsdl/soap/'
+XSD_NS = 'http://www.w3.org/2001/XMLSchema'
+SERVICE_NS = 'urn:uav:enrollments'
+
+# Bytes leídos del stream de la petición por cada `feed` al parser.
+READ_SIZE = 64 * 1024
+
+# Tipos complejos con nombre usados por las operaciones.
+TYPES = {}
+
+
+class Operation:
+    """Operación registrada.
+
+    `streaming=True` indica que el handler recibe el iterador de eventos y
+    consume él mismo el resto del documento (peticiones de tamaño arbitrario);
+    si no, el documento se lee completo antes de llamar a `handler(op_elem)`.
+    """
+
+    def __init__(self, name, handler, request, response, streaming=False, item=None):
+        self.name = name
+        self.handler = handler
+        self.request = request
+        self.response = response
+        self.streaming = streaming
+        # (etiqueta, tipo) de los registros que una operación en streaming valida uno a uno.
+        self.item = item
+
+
+OPERATIONS = {}
+
+
+def operation(name, request, response, streaming=False, item=None):
+    """Decorador que registra un handler como operación SOAP `name`."""
+    def decorator(handler):
+        OPERATIONS[name] = Operation(name, handler, request, response, streaming, item)
+        return handler
+    return decorator
+
+
+def complex_type(name, fields):
+    """Registrar un tipo complejo con nombre para usarlo en los campos."""
+    TYPES[name] = fields
+    return name
+
+
+# --- Parser ----------------------------------------------------------------------
+
+class ParserCache:
+    """Parsers incrementales endurecidos, reutilizados entre peticiones.
+
+    Crear un parser de libxml2 por petición cuesta más que parsear un envelope
+    pequeño; aquí cada hilo reutiliza el suyo (los parsers de lxml no se pueden
+    compartir entre hilos). Si el hilo ya tiene uno en uso, por ejemplo en una
+    respuesta en streaming sin terminar, se crea uno nuevo.
+    """
+
+    OPTIONS = dict(resolve_entities=False, no_network=True, load_dtd=False, huge_tree=False,
+                   remove_comments=True, remove_pis=True)
+
+    def __init__(self, events=('start', 'end')):
+        self._events = events
+        self._local = threading.local()
+
+    def _take(self):
+        parser = getattr(self._local, 'parser', None)
+        self._local.parser = None
+        if parser is None:
+            parser = etree.XMLPullParser(events=self._events, **self.OPTIONS)
+        return parser
+
+    def _give_back(self, parser, closed):
+        if not closed:
+            # Documento incompleto o inválido: cerrar descarta su estado.
+            try:
+                parser.close()
+            except etree.XMLSyntaxError:
+                pass
+        for _ in parser.read_events():
+            pass
+        self._local.parser = parser
+
+    def iterparse(self, stream, read_size=READ_SIZE):
+        """Eventos (evento, elemento) del documento leído de `stream` por bloques."""
+        parser = self._take()
+        closed = False
+        try:
+            while True:
+                data = stream.read(read_size)
+                if not data:
+                    break
+                try:
+                    parser.feed(data)
+                except etree.XMLSyntaxError:
+                    # Entregar lo que se alcanzó a parsear antes del error.
+                    yield from parser.read_events()
+                    raise
+                yield from parser.read_events()
+            closed = True
+            parser.close()
+            yield from parser.read_events()
+        finally:
+            self._give_back(parser, closed)
+
+
+def read_operation(events):
+    """Avanzar el parseo incremental hasta el elemento de operación.
+
+    Devuelve el primer hijo de Body recién abierto (sus hijos se siguen
+    parseando al consumir `events`) o None si el documento no lo tiene.
+    """
+    in_body = False
+    for event, elem in events:
+        if elem.tag == SOAP_BODY:
+            if event == 'end':
+                return None
+            in_body = True
+        elif in_body and event == 'start':
+            return elem
+    return None
+
+
+def local_name(tag):
+    return tag.split('}')[-1] if '}' in tag else tag
+
+
+# --- XSD y WSDL ------------------------------------------------------------------
+
+def _xsd(tag):
+    return f'{{{XSD_NS}}}{tag}'
+
+
+def _sequence(parent, fields):
+    seq = etree.SubElement(parent, _xsd('sequence'))
+    for name, type_, min_occurs, max_occurs in fields:
+        attrs = {'name': name, 'type': type_}
+        if min_occurs != 1:
+            attrs['minOccurs'] = str(min_occurs)
+        if max_occurs != 1:
+            attrs['maxOccurs'] = str(max_occurs)
+        etree.SubElement(seq, _xsd('element'), attrs)
+    return seq
+
+
+def build_schema(operations=None):
+    """Elemento xsd:schema con los tipos y los elementos de petición/respuesta.
+
+    Sin targetNamespace: describe los mensajes tal como se envían hoy.
+    """
+    operations = OPERATIONS if operations is None else operations
+    schema = etree.Element(_xsd('schema'), nsmap={'xsd': XSD_NS}, elementFormDefault='unqualified')
+    for name, fields in TYPES.items():
+        _sequence(etree.SubElement(schema, _xsd('complexType'), name=name), fields)
+    for op in operations.values():
+        for name, fields in ((op.name, op.request), (f'{op.name}Response', op.response)):
+            element = etree.SubElement(schema, _xsd('element'), name=name)
+            _sequence(etree.SubElement(element, _xsd('complexType')), fields)
+    return schema
+
+
+class Validator:
+    """Validación contra el XSD generado, compilado una vez por hilo.
+
+    Además de las operaciones declara como globales los registros (`item`) de
+    las operaciones en streaming, que se validan uno por uno al llegar.
+    """
+
+    def __init__(self, operations=None):
+        operations = OPERATIONS if operations is None else operations
+        self._doc = build_schema(operations)
+        for op in operations.values():
+            if op.item:
+                etree.SubElement(self._doc, _xsd('element'), name=op.item[0], type=op.item[1])
+        self._local = threading.local()
+        self._schema()  # un XSD inválido falla al arrancar, no en la primera petición
+
+    def _schema(self):
+        schema = getattr(self._local, 'schema', None)
+        if schema is None:
+            schema = self._local.schema = etree.XMLSchema(self._doc)
+        return schema
+
+    def check(self, elem):
+        """None si `elem` es válido; si no, el mensaje del primer error."""
+        schema = self._schema()
+        if schema.validate(elem):
+            return None
+        return schema.error_log[0].message
+
+
+def build_wsdl(address, operations=None):
+    """WSDL document/literal completo (tipos, mensajes, portType, binding, service)."""
+    operations = OPERATIONS if operations is None else operations
+
+    def w(tag):
+        return f'{{{WSDL_NS}}}{tag}'
+
+    def s(tag):
+        return f'{{{WSDL_SOAP_NS}}}{tag}'
+
+    root = etree.Element(w('definitions'), name='EnrollmentService', targetNamespace=SERVICE_NS,
+                         nsmap={'wsdl': WSDL_NS, 'soap': WSDL_SOAP_NS, 'xsd': XSD_NS, 'tns': SERVICE_NS})
+    etree.SubElement(root, w('types')).append(build_schema(operations))
+    for op in operations.values():
+        for suffix in ('Request', 'Response'):
+            message = etree.SubElement(root, w('message'), name=f'{op.name}{suffix}')
+            # Los elementos de la petición no tienen namespace: QName sin prefijo.
+            element = op.name if suffix == 'Request' else f'{op.name}Response'
+            etree.SubElement(message, w('part'), name='parameters', element=element)
+
+    port_type = etree.SubElement(root, w('portType'), name='EnrollmentPortType')
+    for op in operations.values():
+        o = etree.SubElement(port_type, w('operation'), name=op.name)
+        etree.SubElement(o, w('input'), message=f'tns:{op.name}Request')
+        etree.SubElement(o, w('output'), message=f'tns:{op.name}Response')
+
+    binding = etree.SubElement(root, w('binding'), name='EnrollmentBinding', type='tns:EnrollmentPortType')
+    etree.SubElement(binding, s('binding'), style='document', transport='http://schemas.xmlsoap.org/soap/http')
+    for op in operations.values():
+        o = etree.SubElement(binding, w('operation'), name=op.name)
+        etree.SubElement(o, s('operation'), soapAction=f'{SERVICE_NS}:{op.name}')
+        for direction in ('input', 'output'):
+            etree.SubElement(etree.SubElement(o, w(direction)), s('body'), use='literal')
+
+    service = etree.SubElement(root, w('service'), name='EnrollmentService')
+    port = etree.SubElement(service, w('port'), name='EnrollmentPort', binding='tns:EnrollmentBinding')
+    etree.SubElement(port, s('address'), location=address)
+    return etree.tostring(root, encoding='UTF-8', xml_declaration=True, pretty_print=True)
@@ -0,0 +1,88 @@
+"""
+Fixtures comunes: bases SQLite temporales (sin servidor) y los servicios
+Flask (REST y SOAP) cargados contra ellas, como en bench/inprocess.py.
+
+Ejecutar desde la raíz: `python -m pytest tests`.
+"""
+import importlib.util
+import itertools
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'rest_service_py'))
+sys.path.insert(0, os.path.join(ROOT, 'soap_service'))
+from storage import COURSES, ENROLLMENTS, STUDENTS, connect
+
+_loaded = itertools.count()
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f'sqlite:///{tmp_path / "test.db"}'
+
+
+@pytest.fixture
+def conn(db_url):
+    """Conexión suelta: hace las veces de otro proceso que escribe en la misma base."""
+    connection = connect(db_url)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def catalog(conn):
+    """Dos estudiantes, dos cursos (3 y 5 créditos) y sus cuatro matrículas."""
+    students = [STUDENTS.insert(conn, (f'T{i}', 'Nombre', 'Apellido', None)) for i in (1, 2)]
+    courses = [COURSES.insert(conn, (f'C{i}', f'Curso {i}', credits)) for i, credits in ((1, 3), (2, 5))]
+    enrollments = {(s, c): ENROLLMENTS.insert(conn, (s, c, 'enrolled')) for s in students for c in courses}
+    return dict(students=students, courses=courses, enrollments=enrollments)
+
+
+def load_app(path, db_url, monkeypatch, **env):
+    """Importar una app de servicio como módulo nuevo apuntando a `db_url`."""
+    monkeypatch.setenv('DATABASE_URL', db_url)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    spec = importlib.util.spec_from_file_location(f'service_{next(_loaded)}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def make_rest(db_url, conn, monkeypatch):
+    """Cargar el servicio REST (app.py) sobre `db_url`; cada llamada es un proceso nuevo."""
+    loaded = []
+
+    def make(**env):
+        module = load_app(os.path.join(ROOT, 'rest_service_py', 'app.py'), db_url, monkeypatch, **env)
+        loaded.append(module)
+        return module
+
+    yield make
+    for module in loaded:
+        module.db_pool.close_all()
+
+
+@pytest.fixture
+def rest(make_rest):
+    return make_rest()
+
+
+@pytest.fixture
+def make_soap(db_url, conn, monkeypatch):
+    """Cargar el servicio SOAP sobre `db_url` con las variables de `env`."""
+    loaded = []
+
+    def make(**env):
+        module = load_app(os.path.join(ROOT, 'soap_service', 'app.py'), db_url, monkeypatch, **env)
+        loaded.append(module)
+        return module
+
+    yield make
+    for module in loaded:
+        module.db_pool.close_all()
@@ -0,0 +1,30 @@
+"""Validación por elemento de los POST /batch."""
+
+
+def test_invalid_grades_are_item_errors(rest, catalog):
+    client = rest.app.test_client()
+    enrollment = next(iter(catalog['enrollments'].values()))
+    batch = [{'enrollment_id': enrollment, 'grade': 90},
+             {'enrollment_id': enrollment, 'grade': 'abc'},
+             {'enrollment_id': enrollment, 'grade': 101},
+             {'enrollment_id': enrollment, 'grade': 'NaN'},
+             {'enrollment_id': 'x', 'grade': 80},
+             {'enrollment_id': enrollment, 'grade': '72.5'}]
+
+    response = client.post('/api/grades/batch', json=batch)
+
+    assert response.status_code == 207
+    body = response.get_json()
+    assert (body['created'], body['failed']) == (2, 4)
+    assert [r.get('index') for r in body['results']] == [None, 1, 2, 3, 4, None]
+    assert body['results'][2]['error'] == 'grade must be between 0 and 100'
+    listed = client.get('/api/grades').get_json()
+    assert sorted(g['grade'] for g in listed) == ['72.50', '90.00']
+
+
+def test_invalid_grade_is_a_400(rest, catalog):
+    client = rest.app.test_client()
+    enrollment = next(iter(catalog['enrollments'].values()))
+    for grade in ('abc', -1, 'Infinity'):
+        response = client.post('/api/grades', json={'enrollment_id': enrollment, 'grade': grade})
+        assert response.status_code == 400
@@ -0,0 +1,29 @@
+"""Límite de long-polls en espera en GET /api/changes."""
+from storage import STUDENTS
+
+
+def test_waiting_long_polls_are_bounded(make_rest, conn):
+    rest = make_rest(CHANGES_MAX_POLLERS='1')
+    client = rest.app.test_client()
+    # Otro cliente ocupa el único lugar mientras espera.
+    assert rest.poll_slots.acquire(blocking=False)
+    try:
+        busy = client.get('/api/changes?cursor=0&timeout=5')
+        assert busy.status_code == 503
+        assert busy.headers['Retry-After'] == str(rest.POLL_RETRY_AFTER)
+        # Sin espera no ocupa un hilo: se atiende igual.
+        assert client.get('/api/changes?cursor=0&timeout=0').status_code == 200
+    finally:
+        rest.poll_slots.release()
+
+
+def test_long_poll_frees_its_slot(make_rest, conn):
+    rest = make_rest(CHANGES_MAX_POLLERS='1')
+    client = rest.app.test_client()
+    STUDENTS.insert(conn, ('L1', 'Lia', 'Uno', None))
+    for _ in range(2):
+        resp = client.get('/api/changes?cursor=0&timeout=1')
+        assert resp.status_code == 200
+        assert resp.get_json()['changes'][0]['data']['student_number'] == 'L1'
+    assert rest.poll_slots.acquire(blocking=False)
+    rest.poll_slots.release()
@@ -0,0 +1,64 @@
+"""ETag y caché de lectura frente a escrituras de otros procesos."""
+from storage import STUDENTS, table_version
+
+
+def test_write_from_other_process_changes_etag_and_body(rest, conn):
+    client = rest.app.test_client()
+    STUDENTS.insert(conn, ('A1', 'Ana', 'Uno', None))
+    first = client.get('/api/students')
+    assert len(first.get_json()) == 1
+    assert client.get('/api/students').headers['ETag'] == first.headers['ETag']
+    assert rest.read_cache.stats()['hits'] == 1
+
+    # Otra conexión (otro worker, import_grades.py...) inserta sin pasar por este proceso.
+    STUDENTS.insert(conn, ('A2', 'Ana', 'Dos', None))
+    second = client.get('/api/students')
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert len(second.get_json()) == 2
+
+    assert client.get('/api/students', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+    assert client.get('/api/students', headers={'If-None-Match': second.headers['ETag']}).status_code == 304
+
+
+def test_etag_is_the_same_in_every_process(make_rest, conn):
+    first, second = make_rest(), make_rest()
+    STUDENTS.insert(conn, ('B1', 'Beto', 'Uno', None))
+    first.app.test_client().post('/api/students', json={'student_number': 'B2', 'first_name': 'B',
+                                                        'last_name': 'Dos'})
+    tags = {service.app.test_client().get('/api/students').headers['ETag'] for service in (first, second)}
+    assert len(tags) == 1
+
+
+def test_formats_have_their_own_etag_and_cache_entry(rest, conn):
+    client = rest.app.test_client()
+    STUDENTS.insert(conn, ('C1', 'Caro', 'Uno', None))
+    plain = client.get('/api/students')
+    columnar = client.get('/api/students', headers={'Accept': 'application/vnd.columnar+json'})
+    assert columnar.content_type == 'application/vnd.columnar+json'
+    assert columnar.headers['ETag'] != plain.headers['ETag']
+    again = client.get('/api/students', headers={'Accept': 'application/vnd.columnar+json'})
+    assert again.content_type == 'application/vnd.columnar+json'
+    assert again.get_data() == columnar.get_data()
+
+
+def test_last_modified_sent_back_alone_gives_304(rest, conn):
+    client = rest.app.test_client()
+    STUDENTS.insert(conn, ('D1', 'Dani', 'Uno', None))
+    first = client.get('/api/students')
+
+    again = client.get('/api/students', headers={'If-Modified-Since': first.headers['Last-Modified']})
+
+    assert again.status_code == 304
+
+
+def test_version_is_the_sum_of_its_shards(conn):
+    for i in range(40):
+        STUDENTS.insert(conn, (f'E{i}', 'Eva', 'Uno', None))
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM table_versions WHERE table_name = 'students'")
+    shards = cur.fetchone()[0]
+    max_id, version, _ = table_version(cur, 'students')
+    cur.close()
+    # 40 escrituras en 16 filas al azar: casi seguro más de una fila tocada.
+    assert shards > 1
+    assert (max_id, version) == (40, 40)
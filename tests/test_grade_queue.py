@@ -0,0 +1,93 @@
+"""Cola de escritura diferida: sólo el dueño de la concesión vacía la cola."""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+import grade_queue
+from grade_queue import GradeQueue
+from storage import GRADES, create_pool
+
+
+@pytest.fixture
+def workers(db_url, tmp_path):
+    """Dos workers que comparten el archivo de la cola y la base."""
+    pool = create_pool(db_url)
+    queues = []
+
+    def make(owner, **options):
+        queue = GradeQueue(str(tmp_path / 'queue.db'), pool, **options)
+        # Lo que hace ensure_started, sin arrancar el hilo de vaciado.
+        queue._owner = owner
+        queues.append(queue)
+        return queue
+
+    yield make
+    pool.close_all()
+
+
+def statuses(queue, tickets):
+    return [queue.status(t)['status'] for t in tickets]
+
+
+def test_only_the_lease_owner_flushes(workers, catalog):
+    first, second = workers('w1'), workers('w2')
+    enrollment = next(iter(catalog['enrollments'].values()))
+    ticket = first.append(enrollment, Decimal('88'))
+
+    assert first._acquire_lease()
+    assert not second._acquire_lease()
+    assert first.flush() == 1
+    assert first.status(ticket)['status'] == 'persisted'
+
+
+def test_flush_stops_when_the_lease_is_lost(workers, catalog):
+    enrollment = next(iter(catalog['enrollments'].values()))
+    first, second = workers('w1', batch_size=1), workers('w2', batch_size=1)
+
+    def pause_past_lease():
+        # El proceso se detuvo más de LEASE_SECONDS y el otro worker tomó la concesión.
+        first._db().execute('UPDATE lease SET expires = 0')
+        assert second._acquire_lease()
+    first.on_flush = pause_past_lease
+    tickets = [first.append(enrollment, Decimal(grade)) for grade in ('70', '80', '90')]
+
+    assert first._acquire_lease()
+    assert first.flush() == 1
+    assert statuses(first, tickets) == ['persisted', 'queued', 'queued']
+    assert not first.stats()['leader']
+
+    assert second.flush() == 2
+    assert statuses(first, tickets) == ['persisted'] * 3
+
+
+def graded_at(conn, grade_id):
+    cur = conn.cursor()
+    cur.execute('SELECT graded_at FROM grades WHERE id = %s', (grade_id,))
+    value = cur.fetchone()[0]
+    cur.close()
+    return value
+
+
+def test_queued_and_direct_grades_share_the_clock(workers, catalog, conn):
+    queue = workers('w1')
+    enrollment = next(iter(catalog['enrollments'].values()))
+    # Síncrono: graded_at lo pone la BD con CURRENT_TIMESTAMP.
+    direct = GRADES.insert(conn, (enrollment, Decimal('75')))
+    ticket = queue.append(enrollment, Decimal('85'))
+    queue._acquire_lease()
+    queue.flush()
+
+    queued = graded_at(conn, queue.status(ticket)['grade_id'])
+    assert abs(queued - graded_at(conn, direct)) < timedelta(seconds=5)
+
+
+def test_queued_grades_use_the_session_time_zone(workers, catalog, conn, monkeypatch):
+    monkeypatch.setattr(grade_queue, 'utc_offset', lambda conn: timedelta(hours=-6))
+    queue = workers('w1')
+    ticket = queue.append(next(iter(catalog['enrollments'].values())), Decimal('85'))
+    queue._acquire_lease()
+    queue.flush()
+
+    status = queue.status(ticket)
+    assert graded_at(conn, status['grade_id']) == datetime.fromisoformat(status['queued_at']) - timedelta(hours=6)
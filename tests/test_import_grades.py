@@ -0,0 +1,192 @@
+"""Importación masiva: lectores en streaming, fechas fuera de rango y reintentos."""
+import csv
+import sqlite3
+import zipfile
+from decimal import Decimal
+from xml.etree import ElementTree
+
+import pytest
+
+import import_grades
+import storage
+from import_grades import MalformedRecord, import_file, parse_graded_at, read_json, read_xlsx
+from storage import GRADES
+
+
+def count_grades(conn):
+    cur = conn.cursor()
+    cur.execute('SELECT COUNT(*) FROM grades')
+    total = cur.fetchone()[0]
+    cur.close()
+    return total
+
+
+def error_report(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return {int(row['record']): row['error'] for row in csv.DictReader(f)}
+
+
+def write_xlsx(path, rows):
+    """Libro mínimo: encabezado y códigos como cadenas compartidas, el resto en línea."""
+    ns = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    shared = ['student_number', 'course_code', 'grade', 'C1']
+    cells = []
+    for r, row in enumerate(rows, start=1):
+        xml = []
+        for col, value in zip('ABC', row):
+            ref = f'{col}{r}'
+            if value in shared:
+                xml.append(f'<c r="{ref}" t="s"><v>{shared.index(value)}</v></c>')
+            elif col == 'C':
+                xml.append(f'<c r="{ref}"><v>{value}</v></c>')
+            else:
+                xml.append(f'<c r="{ref}" t="inlineStr"><is><t>{value}</t></is></c>')
+        cells.append(f'<row r="{r}">{"".join(xml)}</row>')
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('xl/sharedStrings.xml', f'<sst xmlns="{ns}">'
+                    + ''.join(f'<si><t>{text}</t></si>' for text in shared) + '</sst>')
+        zf.writestr('xl/worksheets/sheet1.xml', f'<worksheet xmlns="{ns}"><sheetData>'
+                    + ''.join(cells) + '</sheetData></worksheet>')
+
+
+def flaky(calls, failures):
+    """after_insert que falla con un error transitorio las primeras `failures` veces."""
+    def after_insert(conn, grades):
+        calls.append(len(grades))
+        if len(calls) <= failures:
+            raise sqlite3.OperationalError('database is locked')
+        storage.update_grade_aggregates(conn, grades)
+    return after_insert
+
+
+def test_transient_error_retries_whole_chunk(conn, catalog, monkeypatch):
+    monkeypatch.setattr(storage, 'RETRY_DELAY', 0)
+    calls = []
+    monkeypatch.setattr(GRADES, 'after_insert', flaky(calls, 2), raising=False)
+    enrollment = catalog['enrollments'][(catalog['students'][0], catalog['courses'][0])]
+
+    results = GRADES.insert_many(conn, [(0, (enrollment, Decimal('80'))), (1, (enrollment, Decimal('90')))])
+
+    assert all(isinstance(r, int) for r in results.values())
+    assert calls == [2, 2, 2]
+    assert count_grades(conn) == 2
+
+
+def test_persistent_transient_error_is_reported_per_row(conn, catalog, monkeypatch):
+    monkeypatch.setattr(storage, 'RETRY_DELAY', 0)
+    calls = []
+    monkeypatch.setattr(GRADES, 'after_insert', flaky(calls, 99), raising=False)
+    enrollment = catalog['enrollments'][(catalog['students'][0], catalog['courses'][0])]
+
+    results = GRADES.insert_many(conn, [(0, (enrollment, Decimal('80'))), (1, (enrollment, Decimal('90')))])
+
+    assert all(storage.is_transient(r) for r in results.values())
+    assert len(calls) == storage.TRANSACTION_RETRIES + 1
+    assert count_grades(conn) == 0
+
+
+@pytest.mark.parametrize('text', ['inf', '-inf', '1e400', '99999999999999', '2958466'])
+def test_out_of_range_graded_at_is_a_value_error(text):
+    with pytest.raises(ValueError, match='out of range'):
+        parse_graded_at(text)
+
+
+def test_out_of_range_dates_are_reported_per_row(db_url, catalog, tmp_path):
+    source = tmp_path / 'grades.csv'
+    source.write_text('student_number,course_code,grade,graded_at\n'
+                      'T1,C1,80,45000\n'
+                      'T1,C2,90,1e400\n'
+                      'T2,C1,70,99999999999999\n'
+                      'T2,C2,60,2024-03-01\n', encoding='utf-8')
+
+    totals = import_file(str(source), db_url, workers=1, progress=False)
+
+    assert (totals['inserted'], totals['errors']) == (2, 2)
+    assert error_report(totals['errors_file']) == {2: "graded_at out of range '1e400'",
+                                                   3: "graded_at out of range '99999999999999'"}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 100])
+def test_copy_of_a_failed_row_is_not_a_duplicate(db_url, conn, catalog, tmp_path, monkeypatch, chunk_size):
+    insert_chunk = import_grades.insert_chunk
+
+    def failing_first(db_pool, rows):
+        results = insert_chunk(db_pool, [row for row in rows if row[0] != 1])
+        if any(record == 1 for record, _ in rows):
+            results[1] = ValueError('boom')
+        return results
+
+    monkeypatch.setattr(import_grades, 'insert_chunk', failing_first)
+    source = tmp_path / 'grades.csv'
+    source.write_text('student_number,course_code,grade\n'
+                      'T1,C1,80\n'
+                      'T1,C1,80\n'
+                      'T1,C1,80\n', encoding='utf-8')
+
+    totals = import_file(str(source), db_url, workers=2, chunk_size=chunk_size, progress=False)
+
+    assert (totals['inserted'], totals['errors'], totals['duplicates']) == (1, 1, 1)
+    assert error_report(totals['errors_file']) == {1: 'insert failed: boom', 3: 'duplicate'}
+    assert count_grades(conn) == 1
+
+
+def test_read_xlsx_keeps_only_the_current_row(tmp_path, monkeypatch):
+    path = tmp_path / 'grades.xlsx'
+    write_xlsx(path, [('student_number', 'course_code', 'grade')]
+               + [(f'T{i}', 'C1', i % 100) for i in range(5000)])
+    roots, original = [], ElementTree.iterparse
+
+    def iterparse(source, events=None):
+        """iterparse que anota la raíz de cada documento para medir cuánto árbol queda vivo."""
+        wanted = events or ('end',)
+        parsed = original(source, ('start', 'end'))
+        event, root = next(parsed)
+        roots.append(root)
+        if event in wanted:
+            yield event, root
+        for event, elem in parsed:
+            if event in wanted:
+                yield event, elem
+    monkeypatch.setattr(import_grades.ElementTree, 'iterparse', iterparse)
+
+    largest = 0
+    for i, row in enumerate(read_xlsx(path)):
+        assert row == {'student_number': f'T{i}', 'course_code': 'C1', 'grade': str(i % 100)}
+        largest = max(largest, sum(1 for _ in roots[-1].iter()))
+    assert i == 4999
+    # Sólo lo que iterparse lee por adelantado (bloques de 16 KiB), no un <row> vacío por cada fila leída.
+    assert largest < 2000
+
+
+def test_read_json_reports_malformed_objects_and_resyncs(tmp_path):
+    ndjson = tmp_path / 'grades.ndjson'
+    ndjson.write_text('{"matricula": "T1", "grade": 80}\n'
+                      '{"matricula": "T2", "grade": }\n'
+                      '{"matricula": "T3", "grade": "sin cerrar}\n'
+                      '{"matricula": "T4", "grade": 70}', encoding='utf-8')
+    array = tmp_path / 'grades.json'
+    array.write_text('[\n  {\n    "matricula": "T1",\n    "grade": 80\n  },\n'
+                     '  {\n    "matricula": "T2",\n    "grade": 8 0\n  },\n'
+                     '  {\n    "matricula": "T4",\n    "grade": 70\n  }\n]\n', encoding='utf-8')
+
+    for path, bad_lines in ((ndjson, [2, 3]), (array, [8])):
+        # Bloques chicos: los objetos válidos también quedan cortados entre lecturas.
+        records = list(read_json(path, block_size=7))
+        valid = [r for r in records if isinstance(r, dict)]
+        errors = [str(r) for r in records if isinstance(r, MalformedRecord)]
+        assert [r['matricula'] for r in valid] == ['T1', 'T4']
+        assert [e.split(':')[0] for e in errors] == [f'malformed JSON at line {n}' for n in bad_lines]
+        assert len(records) == len(valid) + len(errors)
+
+
+def test_malformed_json_is_a_row_error(db_url, catalog, tmp_path):
+    source = tmp_path / 'grades.ndjson'
+    source.write_text('{"matricula": "T1", "clave": "C1", "grade": 80}\n'
+                      '{"matricula": "T1", "clave": "C2", "grade": 9x}\n'
+                      '{"matricula": "T2", "clave": "C1", "grade": 70}\n', encoding='utf-8')
+
+    totals = import_file(str(source), db_url, workers=1, progress=False)
+
+    assert (totals['inserted'], totals['errors']) == (2, 1)
+    assert list(error_report(totals['errors_file'])) == [2]
+    assert error_report(totals['errors_file'])[2].startswith('malformed JSON at line 2')
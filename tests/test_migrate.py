@@ -0,0 +1,39 @@
+"""Clasificación de los planes de EXPLAIN en `migrate.py --verify`."""
+import pytest
+
+from migrate import INDEX_SCAN_MAX_ROWS, plan_problem
+
+
+@pytest.mark.parametrize('row', [
+    dict(table='grades', type='range', key='PRIMARY', rows=100),
+    dict(table='enrollments', type='ref', key='idx_enrollments_student', rows=4),
+    dict(table='e', type='eq_ref', key='PRIMARY', rows=1),
+    dict(table='courses', type='const', key='PRIMARY', rows=1),
+    dict(table=None, type=None, key=None, rows=None, Extra='Select tables optimized away'),
+    dict(table='courses', type='index', key='idx_courses_code', rows=40, Extra='Using index'),
+])
+def test_indexed_plans_pass(row):
+    assert plan_problem(row) is None
+
+
+@pytest.mark.parametrize('row, problem', [
+    (dict(table='grades', type='ALL', key=None, rows=50000), 'full scan de grades'),
+    (dict(table='grades', type='index', key='PRIMARY', rows=50000), 'full index scan de grades (PRIMARY)'),
+    (dict(table='grades', type='range', key=None, rows=50000), 'grades sin índice'),
+])
+def test_scans_and_unindexed_plans_fail(row, problem):
+    assert plan_problem(row) == problem
+
+
+def test_row_estimate_limit_is_opt_in():
+    row = dict(table='grades', type='range', key='idx_grades_graded_at', rows=20000)
+    assert plan_problem(row) is None
+    assert plan_problem(row, max_rows=20000) is None
+    assert plan_problem(row, max_rows=10000) == 'grades: 20000 filas estimadas (máximo 10000)'
+
+
+def test_index_scan_fails_only_above_the_row_threshold():
+    row = dict(table='grades', type='index', key='PRIMARY', rows=INDEX_SCAN_MAX_ROWS)
+    assert plan_problem(row) is None
+    row['rows'] += 1
+    assert plan_problem(row) == 'full index scan de grades (PRIMARY)'
@@ -0,0 +1,75 @@
+"""Enrutamiento de lecturas entre primario y réplicas según su estado."""
+import pytest
+
+import replicas
+from replicas import create_routing_pool
+from storage import STUDENTS, connect
+
+
+@pytest.fixture
+def routing(tmp_path, monkeypatch):
+    """Primario y una réplica SQLite con datos distintos; `lag` es lo que mide el chequeo."""
+    urls = {name: f'sqlite:///{tmp_path / name}.db' for name in ('primary', 'replica')}
+    for name, url in urls.items():
+        conn = connect(url)
+        STUDENTS.insert(conn, (name, 'Nombre', 'Apellido', None))
+        conn.close()
+    lag = {'value': 0}
+
+    def replica_lag(conn):
+        if isinstance(lag['value'], Exception):
+            raise lag['value']
+        return lag['value']
+    monkeypatch.setattr(replicas, 'replica_lag', replica_lag)
+    monkeypatch.setenv('DB_REPLICA_CHECK_INTERVAL', '3600')
+    pools = []
+
+    def make(value, **env):
+        for name, setting in env.items():
+            monkeypatch.setenv(name, setting)
+        lag['value'] = value
+        pool = create_routing_pool(urls['primary'], [urls['replica']])
+        pools.append(pool)
+        pool.check()
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close_all()
+
+
+def read_from(pool, primary=False):
+    with pool.read_connection(primary) as conn:
+        return STUDENTS.all(conn)[0]['student_number']
+
+
+def test_reads_go_to_a_replica_within_max_lag(routing):
+    pool = routing(1, DB_REPLICA_MAX_LAG='5')
+    assert read_from(pool) == 'replica'
+    assert read_from(pool, primary=True) == 'primary'
+    assert pool.replica_stats()['replicas_usable'] == 1
+
+
+def test_lagging_replica_falls_back_to_primary(routing):
+    pool = routing(30, DB_REPLICA_MAX_LAG='5')
+    assert read_from(pool) == 'primary'
+    assert pool.replica_stats()['fallback_reads'] == 1
+
+
+def test_unknown_lag_is_unusable_by_default(routing):
+    pool = routing(None)
+    assert read_from(pool) == 'primary'
+    status = pool.routing_status()['replicas'][0]
+    assert (status['healthy'], status['usable'], status['error']) == (True, False, 'retraso desconocido')
+
+
+def test_unknown_lag_can_be_allowed_explicitly(routing):
+    pool = routing(None, DB_REPLICA_ALLOW_UNKNOWN_LAG='1')
+    assert read_from(pool) == 'replica'
+
+
+def test_stopped_replication_marks_the_replica_down(routing):
+    pool = routing(RuntimeError('Replicación detenida'))
+    assert read_from(pool) == 'primary'
+    status = pool.routing_status()['replicas'][0]
+    assert (status['healthy'], status['error']) == (False, 'Replicación detenida')
@@ -0,0 +1,66 @@
+"""CreateEnrollments responde un documento completo después de leer toda la petición."""
+from lxml import etree
+
+from storage import ENROLLMENTS
+
+ENVELOPE = ('<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+            '<CreateEnrollments>{}</CreateEnrollments></soap:Body></soap:Envelope>')
+
+
+def enrollment(student_id, course_id):
+    return f'<enrollment><student_id>{student_id}</student_id><course_id>{course_id}</course_id></enrollment>'
+
+
+def post(soap, body):
+    client = soap.app.test_client()
+    response = client.post('/soap', data=body, content_type='text/xml')
+    assert response.status_code == 200
+    # fromstring falla si el documento quedó cortado.
+    return etree.fromstring(response.get_data()).find('.//CreateEnrollmentsResponse')
+
+
+def outcomes(result):
+    return [(int(r.findtext('index')), r.find('id') is not None) for r in result.iter('result')]
+
+
+def test_results_for_every_chunk(make_soap, catalog):
+    soap = make_soap(SOAP_INGEST_CHUNK_SIZE='2')
+    (s1, s2), (c1, c2) = catalog['students'], catalog['courses']
+    items = [enrollment(s1, c1), enrollment(s2, c2), enrollment(999999, c1), '<enrollment/>', enrollment(s2, c1)]
+
+    result = post(soap, ENVELOPE.format(''.join(items)))
+
+    assert outcomes(result) == [(0, True), (1, True), (2, False), (3, False), (4, True)]
+    assert (result.findtext('created'), result.findtext('failed'), result.find('error')) == ('3', '2', None)
+
+
+def test_truncated_xml_keeps_confirmed_chunks(make_soap, catalog):
+    soap = make_soap(SOAP_INGEST_CHUNK_SIZE='2')
+    (s1, s2), (c1, c2) = catalog['students'], catalog['courses']
+    body = ENVELOPE.format(enrollment(s1, c1) + enrollment(s2, c2) + enrollment(s1, c2))
+    body = body[:body.rindex('<course_id>')]
+
+    result = post(soap, body)
+
+    assert outcomes(result) == [(0, True), (1, True)]
+    assert result.findtext('error').startswith('Invalid XML after record 2')
+    assert (result.findtext('created'), result.findtext('failed')) == ('2', '0')
+
+
+def test_database_error_still_closes_the_document(make_soap, catalog, monkeypatch):
+    soap = make_soap(SOAP_INGEST_CHUNK_SIZE='2')
+    (s1, s2), (c1, c2) = catalog['students'], catalog['courses']
+    insert_many, calls = ENROLLMENTS.insert_many, []
+
+    def failing(conn, rows, chunk_size):
+        calls.append(rows)
+        if len(calls) > 1:
+            raise RuntimeError('connection lost')
+        return insert_many(conn, rows, chunk_size)
+    monkeypatch.setattr(ENROLLMENTS, 'insert_many', failing)
+
+    result = post(soap, ENVELOPE.format(''.join(enrollment(s, c) for s in (s1, s2) for c in (c1, c2))))
+
+    assert outcomes(result) == [(0, True), (1, True)]
+    assert result.findtext('error') == 'Stopped at record 2: connection lost'
+    assert (result.findtext('created'), result.findtext('failed')) == ('2', '0')
@@ -0,0 +1,36 @@
+"""GetEnrollments: los errores de la consulta se responden con 500, no con un 200 cortado."""
+from lxml import etree
+
+from storage import ENROLLMENTS
+
+ENVELOPE = ('<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+            '<GetEnrollments><student_id>{}</student_id></GetEnrollments></soap:Body></soap:Envelope>')
+
+
+def post(soap, student_id):
+    return soap.app.test_client().post('/soap', data=ENVELOPE.format(student_id), content_type='text/xml')
+
+
+def test_enrollments_of_a_student(make_soap, catalog):
+    soap = make_soap()
+    student = catalog['students'][0]
+
+    response = post(soap, student)
+
+    assert response.status_code == 200
+    ids = [int(e) for e in etree.fromstring(response.get_data()).xpath('//enrollment/id/text()')]
+    assert ids == sorted(eid for (s, _), eid in catalog['enrollments'].items() if s == student)
+
+
+def test_query_error_is_a_500(make_soap, catalog, monkeypatch):
+    soap = make_soap()
+
+    def failing(conn, student_id, chunk_size=500):
+        raise RuntimeError('connection lost')
+        yield
+    monkeypatch.setattr(ENROLLMENTS, 'stream_by_student', failing)
+
+    response = post(soap, catalog['students'][0])
+
+    assert response.status_code == 500
+    assert 'connection lost' in response.get_data(as_text=True)
@@ -0,0 +1,67 @@
+"""
+Kárdex (historial académico) de estudiantes en una sola consulta.
+
+Une students, enrollments, courses y grades con LEFT JOIN por llaves
+indexadas (enrollments.student_id, grades.enrollment_id) y arma el resultado
+en una pasada sobre las filas ordenadas. Sustituye las tres llamadas que hacía
+el portal (GetEnrollments, /api/courses y /api/grades) y el cruce en el cliente.
+
+Un estudiante sin matrículas aparece con `enrollments` vacío; una matrícula
+sin calificar, con `grades` vacío.
+"""
+from storage import LOOKUP_BATCH
+
+TRANSCRIPT_SQL = (
+    'SELECT s.id, s.student_number, s.first_name, s.last_name, s.email, '
+    'e.id, e.status, e.enrolled_at, c.id, c.code, c.name, c.credits, g.id, g.grade, g.graded_at '
+    'FROM students s '
+    'LEFT JOIN enrollments e ON e.student_id = s.id '
+    'LEFT JOIN courses c ON c.id = e.course_id '
+    'LEFT JOIN grades g ON g.enrollment_id = e.id '
+    'WHERE s.id IN ({ids}) ORDER BY s.id, e.id, g.graded_at, g.id'
+)
+
+
+def transcripts(conn, student_ids):
+    """Kárdex de varios estudiantes: {student_id: kárdex}, sólo los que existen.
+
+    Los ids se consultan en bloques de LOOKUP_BATCH para acotar la lista IN (...).
+    """
+    ids = list(dict.fromkeys(student_ids))
+    result = {}
+    cur = conn.cursor()
+    try:
+        for start in range(0, len(ids), LOOKUP_BATCH):
+            batch = ids[start:start + LOOKUP_BATCH]
+            cur.execute(TRANSCRIPT_SQL.format(ids=', '.join(['%s'] * len(batch))), tuple(batch))
+            _collect(cur.fetchall(), result)
+    finally:
+        cur.close()
+    return result
+
+
+def transcript(conn, student_id):
+    """Kárdex de un estudiante; None si no existe."""
+    return transcripts(conn, [student_id]).get(student_id)
+
+
+def _collect(rows, result):
+    student = enrollment = None
+    for (sid, number, first, last, email, eid, status, enrolled_at,
+         cid, code, name, credits, gid, grade, graded_at) in rows:
+        if student is None or student['student']['id'] != sid:
+            student = result[sid] = {
+                'student': {'id': sid, 'student_number': number, 'first_name': first,
+                            'last_name': last, 'email': email},
+                'enrollments': [],
+            }
+            enrollment = None
+        if eid is None:
+            continue
+        if enrollment is None or enrollment['id'] != eid:
+            enrollment = {'id': eid, 'status': status, 'enrolled_at': enrolled_at,
+                          'course': {'id': cid, 'code': code, 'name': name, 'credits': credits},
+                          'grades': []}
+            student['enrollments'].append(enrollment)
+        if gid is not None:
+            enrollment['grades'].append({'id': gid, 'grade': grade, 'graded_at': graded_at})